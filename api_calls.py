@@ -0,0 +1,375 @@
+import time
+import random
+import bisect
+import asyncio
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from google.api_core import exceptions as api_exceptions
+
+# Requests per minute and concurrent calls allowed per API, matched to the default project quotas
+# (DLP 600/min, Vision 1800/min, document translation much lower). Override with processing.api_limits.
+DEFAULT_API_LIMITS = {
+    "dlp": {"requests_per_minute": 600, "max_concurrency": 16},
+    "vision": {"requests_per_minute": 1800, "max_concurrency": 16},
+    "translate": {"requests_per_minute": 60, "max_concurrency": 4},
+}
+
+# Quota errors: retried, and the caller's concurrency is cut
+THROTTLE_ERRORS = (api_exceptions.ResourceExhausted, api_exceptions.TooManyRequests)
+# Transient errors: retried as they are
+TRANSIENT_ERRORS = (api_exceptions.ServiceUnavailable, api_exceptions.DeadlineExceeded,
+                    api_exceptions.InternalServerError, api_exceptions.Aborted)
+
+# Upper bounds (seconds) of the latency histogram buckets: 10 ms to ~5 min, 25% apart
+LATENCY_BUCKETS = [round(0.01 * 1.25 ** i, 4) for i in range(47)]
+
+# Callers are shared by every processor of the process: the quota belongs to the project, not to a document
+_shared_callers = {}
+_shared_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average, with bursts of up to `burst` calls."""
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = max(rate, 1e-6)
+        self.capacity = max(1.0, burst if burst is not None else self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        """Takes one token if one is available right now."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def reserve(self) -> float:
+        """Takes one token now, going into debt if needed. Returns the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self) -> float:
+        """Takes one token, sleeping until it is due. Returns the seconds waited."""
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+class LatencyHistogram:
+    """Counts call latencies in the fixed LATENCY_BUCKETS; percentiles are bucket upper bounds."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)  # last bucket: slower than the largest bound
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.total += 1
+
+    def percentile(self, p: float) -> float:
+        with self._lock:
+            if not self.total:
+                return None
+            rank = self.total * p / 100.0
+            seen = 0
+            for i, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank and count:
+                    return LATENCY_BUCKETS[min(i, len(LATENCY_BUCKETS) - 1)]
+        return LATENCY_BUCKETS[-1]
+
+    def snapshot(self) -> dict:
+        """Non-empty buckets as {upper bound in s: count} ("inf" for the overflow bucket)."""
+        with self._lock:
+            bounds = LATENCY_BUCKETS + ["inf"]
+            return {str(bounds[i]): c for i, c in enumerate(self.counts) if c}
+
+
+class AimdLimiter:
+    """
+    Concurrency limit with additive increase / multiplicative decrease: every successful call
+    raises the limit by 1/limit (about +1 per round of calls), a throttled call halves it.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = max(1, min(int(min_limit), self.max_limit))
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    async def acquire_async(self):
+        """Same as acquire() without blocking the event loop (polls, backing off up to 100 ms)."""
+        delay = 0.005
+        while not self.try_acquire():
+            await asyncio.sleep(delay)
+            delay = min(0.1, delay * 2)
+
+    def release(self, throttled: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit / 2)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class ApiCaller:
+    """
+    Wraps the calls to one Google API: token bucket for the request rate, AIMD concurrency
+    limit, and retries with exponential backoff and full jitter on quota and transient errors.
+    `deadline_s` is passed to every call as its gRPC timeout (an expired call is retried).
+    With `hedge`, a call still running after the observed `hedge_percentile` latency gets a
+    duplicate (only if the rate limit has a token to spare) and the first answer wins. The
+    sync clients cannot abort a call in progress, so the slower copy runs to its end and is ignored.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float = 600, max_concurrency: int = 16,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 32.0,
+                 deadline_s: float = None, hedge: bool = False, hedge_percentile: float = 95,
+                 hedge_min_samples: int = 20):
+        self.name = name
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst=max(1.0, requests_per_minute / 60.0))
+        self.limiter = AimdLimiter(max_concurrency)
+        self.max_retries = int(max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline_s = deadline_s
+        self.hedge = bool(hedge)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = int(hedge_min_samples)
+        self.latency = LatencyHistogram()
+        self._executor = ThreadPoolExecutor(max_workers=2 * self.limiter.max_limit,
+                                            thread_name_prefix=f"hedge-{name}") if self.hedge else None
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.quota_wait = 0.0
+        self.backoff_wait = 0.0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def call(self, fn, *args, **kwargs):
+        """Returns fn(*args, **kwargs), retrying quota and transient errors up to max_retries times."""
+        if self.deadline_s and "timeout" not in kwargs:
+            kwargs["timeout"] = self.deadline_s
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            self.limiter.acquire()
+            throttled = False
+            try:
+                return self._attempt(fn, args, kwargs)
+            except (THROTTLE_ERRORS + TRANSIENT_ERRORS) as e:
+                throttled = isinstance(e, THROTTLE_ERRORS)
+                if attempt >= self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+            except Exception:
+                with self._lock:
+                    self.failures += 1
+                raise
+            finally:
+                self.limiter.release(throttled)
+                with self._lock:
+                    self.calls += 1
+                    self.quota_wait += waited
+                    self.throttled += throttled
+
+            # Full jitter: anywhere between 0 and the exponential cap
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            with self._lock:
+                self.retries += 1
+                self.backoff_wait += delay
+            attempt += 1
+            time.sleep(delay)
+
+    async def call_async(self, fn, *args, **kwargs):
+        """call() for the async clients: awaits fn(*args, **kwargs) with the same limits and retries."""
+        if self.deadline_s and "timeout" not in kwargs:
+            kwargs["timeout"] = self.deadline_s
+        attempt = 0
+        while True:
+            waited = self.bucket.reserve()
+            if waited:
+                await asyncio.sleep(waited)
+            await self.limiter.acquire_async()
+            throttled = False
+            try:
+                return await self._attempt_async(fn, args, kwargs)
+            except (THROTTLE_ERRORS + TRANSIENT_ERRORS) as e:
+                throttled = isinstance(e, THROTTLE_ERRORS)
+                if attempt >= self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+            except Exception:
+                with self._lock:
+                    self.failures += 1
+                raise
+            finally:
+                self.limiter.release(throttled)
+                with self._lock:
+                    self.calls += 1
+                    self.quota_wait += waited
+                    self.throttled += throttled
+
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            with self._lock:
+                self.retries += 1
+                self.backoff_wait += delay
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _timed(self, fn, args, kwargs):
+        t0 = time.time()
+        result = fn(*args, **kwargs)
+        self.latency.record(time.time() - t0)
+        return result
+
+    def _attempt(self, fn, args, kwargs):
+        """One attempt, hedged once enough latencies have been observed."""
+        if not self.hedge or self.latency.total < self.hedge_min_samples:
+            return self._timed(fn, args, kwargs)
+        primary = self._executor.submit(self._timed, fn, args, kwargs)
+        done, _ = wait([primary], timeout=self.latency.percentile(self.hedge_percentile))
+        if done or not self.bucket.try_acquire():
+            return primary.result()
+
+        backup = self._executor.submit(self._timed, fn, args, kwargs)
+        with self._lock:
+            self.hedges += 1
+        pending, error = {primary, backup}, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if future is backup:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    async def _timed_async(self, fn, args, kwargs):
+        t0 = time.time()
+        result = await fn(*args, **kwargs)
+        self.latency.record(time.time() - t0)
+        return result
+
+    async def _attempt_async(self, fn, args, kwargs):
+        """_attempt() for coroutines. Here the losing copy of a hedged call really is cancelled."""
+        if not self.hedge or self.latency.total < self.hedge_min_samples:
+            return await self._timed_async(fn, args, kwargs)
+        primary = asyncio.ensure_future(self._timed_async(fn, args, kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=self.latency.percentile(self.hedge_percentile))
+        if done or not self.bucket.try_acquire():
+            return await primary
+
+        backup = asyncio.ensure_future(self._timed_async(fn, args, kwargs))
+        with self._lock:
+            self.hedges += 1
+        pending, error = {primary, backup}, None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if future is backup:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "failures": self.failures,
+                "quota_wait_s": round(self.quota_wait, 2),
+                "backoff_wait_s": round(self.backoff_wait, 2),
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "concurrency_limit": round(self.limiter.limit, 1),
+            }
+
+    def latency_report(self) -> dict:
+        """Latency percentiles and histogram over every call so far, to tune deadlines and hedging."""
+        return {
+            "p50_s": self.latency.percentile(50),
+            "p95_s": self.latency.percentile(95),
+            "p99_s": self.latency.percentile(99),
+            "samples": self.latency.total,
+            "histogram": self.latency.snapshot(),
+        }
+
+
+def merge_api_limits(api_limits: dict = None) -> dict:
+    """DEFAULT_API_LIMITS overridden per API (and per key) by `api_limits`."""
+    merged = {name: dict(limits) for name, limits in DEFAULT_API_LIMITS.items()}
+    for name, limits in (api_limits or {}).items():
+        merged.setdefault(name, {}).update(limits)
+    return merged
+
+
+def split_api_limits(api_limits: dict, parts: int) -> dict:
+    """Per-process share of the limits when `parts` processes draw on the same project quota."""
+    parts = max(1, int(parts))
+    split = {}
+    for name, limits in merge_api_limits(api_limits).items():
+        split[name] = dict(limits)
+        if "requests_per_minute" in limits:
+            split[name]["requests_per_minute"] = max(1, limits["requests_per_minute"] / parts)
+        if "max_concurrency" in limits:
+            split[name]["max_concurrency"] = max(1, limits["max_concurrency"] // parts)
+    return split
+
+
+def shared_callers(api_limits: dict = None) -> dict:
+    """One ApiCaller per API ("dlp", "vision", "translate"), shared process-wide for the same limits."""
+    callers = {}
+    with _shared_lock:
+        for name, limits in merge_api_limits(api_limits).items():
+            key = (name, tuple(sorted(limits.items())))
+            if key not in _shared_callers:
+                _shared_callers[key] = ApiCaller(name, **limits)
+            callers[name] = _shared_callers[key]
+    return callers
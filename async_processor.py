@@ -0,0 +1,393 @@
+import io
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import fitz  # PyMuPDF
+from google.cloud import dlp_v2
+from google.cloud import vision
+from google.cloud import translate_v3 as translate
+
+from dlp_processor import ClinicalDocumentProcessor, FITZ_LOCK, UPLOAD_ENCODINGS
+from page_cache import PageCheckpoint, fingerprint
+from page_pipeline import PageTask
+from processor_events import API_CALL, DOCUMENT_START, PAGE_DONE, REPORT, message_size
+
+# Methods of the async clients called below, checked against the real client classes when the
+# clients are created. The single-feature helpers such as document_text_detection only exist on
+# the sync ImageAnnotatorClient.
+ASYNC_CLIENT_METHODS = (
+    (dlp_v2.DlpServiceAsyncClient, ("inspect_content", "redact_image")),
+    (vision.ImageAnnotatorAsyncClient, ("batch_annotate_images",)),
+    (translate.TranslationServiceAsyncClient, ("translate_document", "translate_text")),
+)
+
+def check_async_clients():
+    """Raises if an async client class lacks a method this module calls (e.g. after a library upgrade)."""
+    missing = [f"{cls.__name__}.{name}" for cls, names in ASYNC_CLIENT_METHODS for name in names
+               if not callable(getattr(cls, name, None))]
+    if missing:
+        raise RuntimeError(f"The installed Google Cloud clients lack {', '.join(missing)}")
+
+
+class AsyncClinicalDocumentProcessor(ClinicalDocumentProcessor):
+    """
+    asyncio version of ClinicalDocumentProcessor built on the async Google Cloud clients.
+    Every page of a document is a coroutine: up to `page_concurrency` pages (hundreds are fine)
+    have their DLP and Vision requests in flight on one event loop, while the PyMuPDF work
+    (render, redact, assemble, save) runs in a small thread pool under FITZ_LOCK.
+    Produces the same output as the sync processor for the same settings, except that
+    `adaptive_zoom`, `dlp_batch_pages`, `vision_batch_pages` and streaming are not applied
+    (every page is inspected and OCRed on its own at the full zoom, the output is built in RAM). The cache, checkpoints and API limits are shared with the sync processor.
+
+        processor = AsyncClinicalDocumentProcessor.from_config(config)
+        pdf_bytes = await processor.process_document("report.pdf")
+    """
+
+    def __init__(self, *args, fitz_workers: int = 2, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(fitz_workers)), thread_name_prefix="fitz")
+        self._loop = None
+
+    def _create_clients(self):
+        # The async clients bind to the running event loop: created on first use
+        self.dlp_client = self.vision_client = self.translate_client = None
+
+    def _ensure_clients(self):
+        self._loop = asyncio.get_running_loop()
+        if self.dlp_client is None:
+            check_async_clients()
+            self.dlp_client = dlp_v2.DlpServiceAsyncClient()
+            self.vision_client = vision.ImageAnnotatorAsyncClient()
+            self.translate_client = translate.TranslationServiceAsyncClient()
+
+    def _in_fitz(self, fn, *args):
+        """Runs fn(*args) in the thread pool under the PyMuPDF lock."""
+        def locked():
+            with FITZ_LOCK:
+                return fn(*args)
+        return asyncio.get_running_loop().run_in_executor(self._executor, locked)
+
+    async def process_document(self, filepath: str, custom_terms: List[str] = None) -> bytes:
+        self._ensure_clients()
+        filename = os.path.basename(filepath)
+        inspect_config = self.build_inspect_config(custom_terms)
+        try:
+            if filepath.lower().endswith(".pdf"):
+                return await self._process_pdf_async(filepath, inspect_config)
+            with open(filepath, "rb") as f:
+                image_bytes = f.read()
+            return await self._redact_image_bytes_async(image_bytes, inspect_config)
+        except Exception as e:
+            self.log(f"Failed to redact {filename}: {str(e)}")
+            raise e
+
+    async def process_document_to_file(self, filepath: str, output_path: str, custom_terms: List[str] = None):
+        """Writes the result to `output_path`. The async pipeline builds its output in RAM (no streaming)."""
+        doc_bytes = await self.process_document(filepath, custom_terms=custom_terms)
+        with open(output_path, "wb") as f:
+            f.write(doc_bytes)
+
+    async def translate_document(self, doc_bytes: bytes, target_language: str = "en") -> List[tuple]:
+        """
+        Same chunking as the sync processor, run in a thread of its own (the PyMuPDF steps take
+        FITZ_LOCK one at a time); every chunk is sent with the async translation client (see
+        _call_translate_api). The thread mostly waits on the API, so it stays out of the fitz
+        pool: the pages of documents being redacted meanwhile keep all of its workers.
+        """
+        self._ensure_clients()
+        return await asyncio.to_thread(super().translate_document, doc_bytes, target_language)
+
+    def _call_translate_api(self, doc_bytes: bytes, target_language: str) -> bytes:
+        # Called from the thread pool by translate_document: hand the request over to the event loop
+        return asyncio.run_coroutine_threadsafe(
+            self._call_translate_api_async(doc_bytes, target_language), self._loop).result()
+
+    def _call_translate_text_api(self, texts: List[str], target_language: str) -> List[str]:
+        # Same hand-over for the batched requests of the "text" translation mode
+        return asyncio.run_coroutine_threadsafe(
+            self._call_translate_text_api_async(texts, target_language), self._loop).result()
+
+    async def _process_pdf_async(self, filepath: str, inspect_config) -> bytes:
+        def open_docs():
+            doc = fitz.open(filepath)
+            return doc, len(doc), fitz.open()
+        doc, total_pages, output_doc = await self._in_fitz(open_docs)
+        self.log(f"Processing PDF (Anonymizing + Flattening + Searchable OCR Overlay)...")
+        self.events.emit(DOCUMENT_START, pages=total_pages)
+        if self.adaptive_zoom or self.dlp_batch_pages > 1 or self.vision_batch_pages > 1 or self.stream_window_pages:
+            self.log("       Note: adaptive_zoom, dlp_batch_pages, vision_batch_pages and streaming are not used by the async processor")
+
+        zoom = 3.0
+        mat = fitz.Matrix(zoom, zoom)
+        use_text_layer = self.inspection_mode == "text_layer"
+        single_ocr = self.inspection_mode == "single_ocr"
+        text_pages = []
+        upload_stats = {"images": 0, "bytes": 0, "encode_s": 0.0}
+        cache_before = self.cache.stats() if self.cache else None
+        api_before = {name: caller.stats() for name, caller in self.api.items()}
+        checkpoint = None
+        if self.checkpoint_store is not None:
+            # Same key as the sync processor: either one can resume the other's pages
+            checkpoint = PageCheckpoint.for_document(self.checkpoint_store, filepath, self._checkpoint_settings(inspect_config))
+        resumed_pages = []
+        failed_pages = []
+
+        def render(task):
+            self.log(f"Analyzing & Digitalizing Page {task.index+1}/{total_pages}...")
+            saved = checkpoint.load(task.index) if checkpoint else None
+            if saved:
+                task.flat_image, info = saved
+                task.rect = fitz.Rect(info["rect"])
+                task.words = [tuple(w) for w in info["words"]]
+                task.redact_rects = []
+                task.done = True
+                resumed_pages.append(task.index)
+                return
+            page = doc.load_page(task.index)
+            task.rect = page.rect
+            task.text_words = None
+            task.pix = None
+            if use_text_layer:
+                words = self._page_words(page)
+                if self._has_usable_text_layer(page, words):
+                    task.text_words = words
+                    text_pages.append(task.index)
+                    return
+            pix = page.get_pixmap(matrix=mat)
+            if self.burn_into_raster:
+                task.pix = pix
+            task.img_bytes = self._encode_upload(pix, upload_stats)
+
+        def redact(task):
+            if self.burn_into_raster:
+                pix = task.pix or doc.load_page(task.index).get_pixmap(matrix=mat)
+                task.pix = None
+                self._burn_redactions(pix, task.redact_rects, task.finding_count, zoom)
+            else:
+                page = doc.load_page(task.index)
+                self._apply_redactions(page, task.redact_rects, task.finding_count)
+                pix = page.get_pixmap(matrix=mat)
+            task.flat_image = self._encode_output(pix)
+            if not single_ocr:
+                task.ocr_bytes = self._encode_upload(pix, upload_stats, png_bytes=self._flat_png(task.flat_image))
+
+        def assemble(task):
+            # As in the sync processor, a failed page fails the document once all pages are done
+            if task.error is not None:
+                task.flat_image = None
+                failed_pages.append(task.index)
+                self.log(f"       Error on page {task.index+1} ({task.error_stage}): {task.error}")
+            else:
+                new_page = self._new_flat_page(output_doc, task.rect, task.flat_image)
+                words = task.words
+                if single_ocr:
+                    words = [w for w in words if not any(fitz.Rect(w[1:5]).intersects(r) for r in task.redact_rects)]
+                self._insert_ocr_words(new_page, words)
+                if checkpoint and not task.done:
+                    checkpoint.save(task.index, task.flat_image, {"rect": list(task.rect), "words": words})
+                task.flat_image = None
+                if task.done:
+                    self.log("       Restored from checkpoint")
+            self.log(f"Page {task.index+1} completed")
+            self.events.emit(PAGE_DONE, page=task.index+1, restored=task.done, error=str(task.error) if task.error else None)
+
+        async def process_page(task):
+            stage = "render"
+            try:
+                await self._in_fitz(render, task)
+                if task.done:
+                    return
+                stage = "inspect"
+                if single_ocr:
+                    stage = "ocr"
+                    words, task.ocr_confidence = await self._ocr_page_async(task.img_bytes)
+                    task.words = self._scale_words(words, zoom)
+                    stage = "inspect"
+                    task.finding_count, task.redact_rects = await self._inspect_words_async(task.words, inspect_config)
+                elif task.text_words is not None:
+                    task.finding_count, task.redact_rects = await self._inspect_words_async(task.text_words, inspect_config)
+                else:
+                    findings = await self._inspect_image_async(task.img_bytes, inspect_config)
+                    task.finding_count, task.redact_rects = len(findings), self._image_findings_to_rects(findings, zoom)
+                task.img_bytes = None
+                stage = "redact"
+                await self._in_fitz(redact, task)
+                if not single_ocr:
+                    stage = "ocr"
+                    words, _ = await self._ocr_page_async(task.ocr_bytes)
+                    task.words = self._scale_words(words, zoom)
+                    task.ocr_bytes = None
+            except Exception as e:
+                task.error, task.error_stage = e, stage
+
+        # Pages finish in any order; they are assembled strictly in page order as soon as possible.
+        # A page only starts within page_concurrency of the next page to assemble, so a slow page
+        # holds back the ones after it instead of letting their images pile up (as PagePipeline does)
+        finished = {}
+        next_index = 0
+        assembled = asyncio.Condition()
+
+        async def run_page(index):
+            nonlocal next_index
+            task = PageTask(index, index)
+            async with assembled:
+                await assembled.wait_for(lambda: index < next_index + self.page_concurrency)
+            await process_page(task)
+            finished[index] = task
+            async with assembled:
+                while next_index in finished:
+                    await self._in_fitz(assemble, finished.pop(next_index))
+                    next_index += 1
+                assembled.notify_all()
+
+        await asyncio.gather(*(run_page(i) for i in range(total_pages)))
+
+        self._log_api_stats(api_before)
+        if resumed_pages:
+            self.log(f"       Checkpoint: resumed {len(resumed_pages)} of {total_pages} pages from a previous run")
+            self.events.emit(REPORT, resumed_pages=len(resumed_pages))
+        self._log_cache_stats(cache_before)
+        if use_text_layer:
+            self.log(f"       Text-layer inspection: {len(text_pages)} pages, image inspection: {total_pages - len(text_pages)} pages")
+            self.events.emit(REPORT, text_layer_pages=len(text_pages))
+
+        if failed_pages:
+            await self._in_fitz(self._discard_output, doc, output_doc)
+            raise self._failed_pages_error(failed_pages, total_pages, checkpoint)
+
+        self.log("Compiling document...")
+        save_t0 = self.events.start("save")
+
+        def save():
+            output_doc.set_metadata({})
+            out_stream = io.BytesIO()
+            output_doc.save(out_stream, **self._save_options())
+            doc.close()
+            output_doc.close()
+            return out_stream.getvalue()
+        t0 = time.time()
+        doc_bytes = await self._in_fitz(save)
+        self._log_output_stats(len(doc_bytes), total_pages, time.time() - t0)
+
+        if checkpoint:
+            checkpoint.discard(total_pages)
+
+        self.log("Success! Redacted searchable PDF generated. (Flattened)")
+        self.events.end("save", save_t0)
+        return doc_bytes
+
+    async def _call_api_async(self, api: str, fn, request_bytes: int, **kwargs):
+        """_call_api() for the async clients."""
+        if not self.events.wants(API_CALL):
+            return await self.api[api].call_async(fn, **kwargs)
+        t0 = time.time()
+        response = await self.api[api].call_async(fn, **kwargs)
+        self.events.emit(API_CALL, api=api, method=fn.__name__, request_bytes=request_bytes,
+                         response_bytes=message_size(response), seconds=round(time.time() - t0, 4))
+        return response
+
+    async def _cached_async(self, kind: str, parts: tuple, call, dumps, loads):
+        """_cached() for coroutines: same keys, so sync and async processors share the cache."""
+        if self.cache is None:
+            return await call()
+        key = self.cache.make_key(kind, *parts)
+        data = self.cache.get(key)
+        if data is not None:
+            return loads(data)
+        t0 = self._loop.time()
+        result = await call()
+        self.cache.put(key, dumps(result), cost_s=self._loop.time() - t0)
+        return result
+
+    async def _inspect_image_async(self, img_bytes: bytes, inspect_config):
+        parent = f"projects/{self.project_id}/locations/global"
+        bytes_type = UPLOAD_ENCODINGS[self.upload_encoding]
+        item = {"byte_item": {"type_": bytes_type, "data": img_bytes}}
+        async def call():
+            response = await self._call_api_async(
+                "dlp", self.dlp_client.inspect_content, len(img_bytes),
+                request={"parent": parent, "inspect_config": inspect_config, "item": item}
+            )
+            return response.result
+        result = await self._cached_async("dlp_image", (int(bytes_type), img_bytes, fingerprint(inspect_config)), call,
+                                          dlp_v2.InspectResult.serialize, dlp_v2.InspectResult.deserialize)
+        return result.findings
+
+    async def _inspect_text_async(self, content: str, inspect_config):
+        parent = f"projects/{self.project_id}/locations/global"
+        async def call():
+            response = await self._call_api_async(
+                "dlp", self.dlp_client.inspect_content, len(content.encode("utf-8")),
+                request={"parent": parent, "inspect_config": inspect_config, "item": {"value": content}}
+            )
+            return response.result
+        return await self._cached_async("dlp_text", (content, fingerprint(inspect_config)), call,
+                                        dlp_v2.InspectResult.serialize, dlp_v2.InspectResult.deserialize)
+
+    async def _inspect_words_async(self, words: List[tuple], inspect_config):
+        """DLP text inspection of one page's words. Returns (finding count, redaction rects)."""
+        if not words:
+            return 0, []
+        content, offsets = self._words_to_text(words)
+        result = await self._inspect_text_async(content, inspect_config)
+        if result.findings_truncated:
+            # One page per request here: nothing left to split
+            self.log("       Warning: DLP truncated the findings of this page; some items may be left unredacted")
+        spans = [(f.location.codepoint_range.start, f.location.codepoint_range.end) for f in result.findings]
+        return len(spans), self._spans_to_rects(spans, offsets, words)
+
+    async def _ocr_page_async(self, img_bytes: bytes) -> tuple:
+        async def call():
+            # The async client has no document_text_detection helper: a batch of one image
+            features = [{"type_": vision.Feature.Type.DOCUMENT_TEXT_DETECTION}]
+            response = (await self._call_api_async(
+                "vision", self.vision_client.batch_annotate_images, len(img_bytes),
+                requests=[{"image": {"content": img_bytes}, "features": features}])).responses[0]
+            if response.error.code:
+                raise RuntimeError(f"Vision OCR error {response.error.code}: {response.error.message}")
+            return self._ocr_words(response, 1.0), self._ocr_confidence(response)
+        return await self._cached_async("vision_ocr", (img_bytes,), call,
+                                        self._ocr_cache_dumps, self._ocr_cache_loads)
+
+    async def _redact_image_bytes_async(self, image_bytes: bytes, inspect_config) -> bytes:
+        parent = f"projects/{self.project_id}/locations/global"
+        black = {"red": 0, "green": 0, "blue": 0}
+        image_redactions = [{"info_type": it, "redaction_color": black} for it in inspect_config.get("info_types", [])]
+        image_redactions += [{"info_type": cit["info_type"], "redaction_color": black}
+                             for cit in inspect_config.get("custom_info_types", [])]
+        response = await self._call_api_async(
+            "dlp", self.dlp_client.redact_image, len(image_bytes),
+            request={
+                "parent": parent,
+                "inspect_config": inspect_config,
+                "image_redactions": image_redactions,
+                "byte_item": {"type_": dlp_v2.ByteContentItem.BytesType.IMAGE_PNG, "data": image_bytes}
+            }
+        )
+        return response.redacted_image
+
+    async def _call_translate_api_async(self, doc_bytes: bytes, target_language: str) -> bytes:
+        response = await self._call_api_async(
+            "translate", self.translate_client.translate_document, len(doc_bytes),
+            request={
+                "parent": f"projects/{self.project_id}/locations/us-central1",
+                "target_language_code": target_language,
+                "document_input_config": {"content": doc_bytes, "mime_type": "application/pdf"},
+            }
+        )
+        return self._translated_bytes(response)
+
+    async def _call_translate_text_api_async(self, texts: List[str], target_language: str) -> List[str]:
+        response = await self._call_api_async(
+            "translate", self.translate_client.translate_text, sum(len(t.encode("utf-8")) for t in texts),
+            request={
+                "parent": f"projects/{self.project_id}/locations/us-central1",
+                "contents": texts,
+                "mime_type": "text/plain",
+                "target_language_code": target_language,
+            }
+        )
+        return [t.translated_text for t in response.translations]
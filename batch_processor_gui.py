@@ -7,9 +7,12 @@ import threading
 import json
 import base64
 import mimetypes
+import queue
+from concurrent.futures import ThreadPoolExecutor
 
 # Note: Integration with Google Cloud DLP (Data Loss Prevention)
-from dlp_processor import ClinicalDocumentProcessor
+from dlp_processor import ClinicalDocumentProcessor, SUPPORTED_EXTENSIONS, write_translation_outputs
+from processor_events import DOCUMENT_START, PAGE_DONE, STAGE_END, STAGE_START, JsonlExporter
 import subprocess
 import threading
 
@@ -27,6 +30,11 @@ class LocalFileProcessorApp:
         self.history_calibrated = False
         self.keywords_mapping = {None: []} # None key stores Global keywords
         self.current_selected_file = None
+        self.document_workers = 1
+        self.doc_states = {} # Per-document timers, keyed by filename (several documents may be in flight)
+        self.event_log = None # processing.event_log: JSON lines file of every processor event, while a batch runs
+        self.ui_lock = threading.RLock() # Guards the stats and timers shared by the worker threads; never held around Tk calls
+        self.ui_calls = queue.Queue() # UI updates from the worker threads, run on the Tk main thread (see run_in_ui)
         
         # Window Close Protocol
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -46,7 +54,8 @@ class LocalFileProcessorApp:
             "total_pages_global": 0,
             "pages_done_global": 0,
             "total_size_mb_global": 0,
-            "size_done_mb_global": 0
+            "size_done_mb_global": 0,
+            "trans_pages_pending": 0 # Redacted but not yet translated
         }
         
         # Load History to refine statistics
@@ -97,7 +106,10 @@ class LocalFileProcessorApp:
                         self.stats["intercept_save"] = b2
 
                         # 3. Regression for Translation (m3, b3) - Based on Payload Size MB
-                        trans_samples = [(s['trans_mb_total'], s['trans_time_total']) for s in samples if s.get('trans_mb_total', 0) > 0]
+                        # Only samples of the configured translation mode: "text" sends a tiny fraction of the MB
+                        trans_mode = self.config.get('translation', {}).get('mode', "document")
+                        trans_samples = [(s['trans_mb_total'], s['trans_time_total']) for s in samples
+                                         if s.get('trans_mb_total', 0) > 0 and s.get('trans_mode', "document") == trans_mode]
                         m3, b3 = self.calculate_regression(trans_samples) if trans_samples else (1.5, 0.5)
                         self.stats["slope_trans"] = m3
                         self.stats["intercept_trans"] = b3
@@ -128,8 +140,9 @@ class LocalFileProcessorApp:
         # Clamp to realistic values
         return max(0.1, slope), max(0.1, intercept)
 
-    def append_history_sample(self, pages, size_mb, page_avg, save_pg_avg, load_mb_avg):
+    def append_history_sample(self, pages, size_mb, page_avg, save_pg_avg, load_mb_avg, trans=None):
         """Store a new document's data into the history file"""
+        trans = trans or {}
         sample = {
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
             "pages": pages,
@@ -137,10 +150,11 @@ class LocalFileProcessorApp:
             "page_avg": round(page_avg, 3),
             "save_pg_avg": round(save_pg_avg, 3),
             "load_mb_avg": round(load_mb_avg, 3),
-            "trans_mb_total": round(self.stats.get("current_doc_trans_mb", 0), 2),
-            "trans_time_total": round(self.stats.get("current_doc_trans_time", 0), 2),
-            "trans_flatten_time": round(self.stats.get("current_doc_trans_flatten_time", 0), 2),
-            "trans_api_time": round(self.stats.get("current_doc_trans_api_time", 0), 2),
+            "trans_mb_total": round(trans.get("trans_mb", 0), 2),
+            "trans_time_total": round(trans.get("trans_time", 0), 2),
+            "trans_flatten_time": round(trans.get("trans_flatten_time", 0), 2),
+            "trans_api_time": round(trans.get("trans_api_time", 0), 2),
+            "trans_mode": self.config.get('translation', {}).get('mode', "document"),
             "ping": self.current_ping,
             "gpu": self.gpu_name
         }
@@ -252,6 +266,28 @@ class LocalFileProcessorApp:
         self.env_bar = tk.Label(self.root, textvariable=self.env_var, fg="#757575", font=("Segoe UI", 8))
         self.env_bar.pack(side=tk.BOTTOM, anchor="e", padx=10)
 
+        self.root.after(50, self.process_ui_calls)
+
+    def run_in_ui(self, fn, *args):
+        """Runs fn(*args) on the Tk main thread: right away when called from it, else queued for process_ui_calls"""
+        if threading.current_thread() is threading.main_thread():
+            fn(*args)
+        else:
+            self.ui_calls.put((fn, args))
+
+    def process_ui_calls(self):
+        """Main thread: applies the UI updates queued by the worker threads, then polls again"""
+        while True:
+            try:
+                fn, args = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"UI Update error: {e}")
+        self.root.after(50, self.process_ui_calls)
+
     def on_closing(self):
         """Handle window X button click"""
         if self.is_processing:
@@ -266,7 +302,7 @@ class LocalFileProcessorApp:
         if self.is_processing:
             if messagebox.askyesno("Stop Processing", "Are you sure you want to stop the batch processing?"):
                 self.should_stop = True
-                self.log_message("Stopping... finishing current document.")
+                self.log_message("Stopping... finishing documents in progress.")
 
     def detect_environment(self):
         """Detect GPU and Ping to adjust estimation formula"""
@@ -297,17 +333,12 @@ class LocalFileProcessorApp:
             
         threading.Thread(target=task, daemon=True).start()
 
-    def log_message(self, message):
-        # Intercept Metadata for estimation
-        metadata = None
-        if "[METADATA:" in message:
-            try:
-                msg_parts = message.split(" [METADATA:")
-                message = msg_parts[0]
-                meta_str = msg_parts[1].rstrip("]")
-                import ast
-                metadata = ast.literal_eval(meta_str)
-            except: pass
+    def log_message(self, message, doc=None):
+        self.run_in_ui(self._log_message, message, doc)
+
+    def _log_message(self, message, doc=None):
+        if doc and self.document_workers > 1:
+            message = f"[{doc}] {message}"
 
         self.status_var.set(message)
         self.text_log.config(state=tk.NORMAL)
@@ -322,9 +353,6 @@ class LocalFileProcessorApp:
             self.text_log.see(tk.END)
             
         self.text_log.config(state=tk.DISABLED)
-        
-        if metadata:
-            self.handle_metadata(metadata)
             
         # Trigger Recalibration every 10 log messages
         self.steps_since_calibration += 1
@@ -333,7 +361,7 @@ class LocalFileProcessorApp:
             self.steps_since_calibration = 0
 
         try:
-            self.root.update()
+            self.root.update_idletasks()
         except: pass
 
     def recalibrate_estimation(self):
@@ -357,83 +385,104 @@ class LocalFileProcessorApp:
         }
         self.save_config()
 
-    def handle_metadata(self, metadata):
-        now = time.time()
-        if "page_done" in metadata:
+    def watch_processor(self, processor, doc):
+        """Subscribes the estimation (and the event log, if any) to `processor` for one document. Returns the callbacks."""
+        callbacks = [processor.events.subscribe(lambda event: self.on_processor_event(event, doc),
+                                                kinds=(DOCUMENT_START, PAGE_DONE, STAGE_START, STAGE_END))]
+        if self.event_log:
+            callbacks.append(processor.events.subscribe(lambda event: self.event_log.export(event, doc=doc)))
+        return callbacks
+
+    def unwatch_processor(self, processor, callbacks):
+        for callback in callbacks:
+            processor.events.unsubscribe(callback)
+
+    def on_processor_event(self, event, doc=None):
+        """Estimation timers, fed by the processor's events (see processor_events.py)"""
+        with self.ui_lock:
+            self.handle_event(event, doc)
+
+    def handle_event(self, event, doc=None):
+        now = event.time
+        stage = event.fields.get("stage")
+        # Every document in flight keeps its own timers so parallel workers don't mix samples
+        state = self.doc_states.setdefault(doc, {})
+        if event.kind == PAGE_DONE:
             self.stats["pages_done_global"] += 1
-            if hasattr(self, '_page_start_time'):
-                duration = now - self._page_start_time
+            if "page_start_time" in state:
+                duration = now - state["page_start_time"]
                 self.measurement_buffers["page_times"].append(duration)
-            self._page_start_time = now
-        
-        elif "save_start" in metadata:
-            self._save_start_time = now
-            self._save_size_mb = metadata["save_start"]
+                state.setdefault("page_times", []).append(duration)
+            state["page_start_time"] = now
             
-        elif "save_done" in metadata:
-            if hasattr(self, '_save_start_time'):
-                duration = now - self._save_start_time
-                if self._current_doc_pages > 0:
-                    time_per_page_save = duration / self._current_doc_pages
-                    self.measurement_buffers["save_times_per_mb"].append(time_per_page_save) # Renamed conceptually in buffer
-                    self.stats["size_done_mb_global"] += self._save_size_mb
+        elif event.kind == STAGE_END and stage == "save":
+            duration = event.fields["seconds"]
+            doc_pages = state.get("pages", 0)
+            if doc_pages > 0:
+                time_per_page_save = duration / doc_pages
+                self.measurement_buffers["save_times_per_mb"].append(time_per_page_save) # Renamed conceptually in buffer
+                self.stats["size_done_mb_global"] += state.get("save_size_mb", 0)
+                
+                if state.get("page_times"):
+                    pages_to_avg = state["page_times"]
+                    doc_page_avg = sum(pages_to_avg) / len(pages_to_avg)
                     
-                    if self.measurement_buffers["page_times"]:
-                        # Look at the last block of pages for this doc
-                        pages_to_avg = self.measurement_buffers["page_times"][-self._current_doc_pages:]
-                        doc_page_avg = sum(pages_to_avg) / len(pages_to_avg) if pages_to_avg else 2.5
-                        
-                        # Use a fixed guess for load time per MB if it's the first run
-                        load_avg = self.stats.get("avg_time_per_mb_load", 0.1)
-                        
-                        self.append_history_sample(
-                            self._current_doc_pages, 
-                            self._save_size_mb, 
-                            doc_page_avg, 
-                            time_per_page_save,
-                            load_avg
-                        )
-                        # Reset translation counters for next doc
-                        self.stats["current_doc_trans_mb"] = 0
-                        self.stats["current_doc_trans_time"] = 0
-                        self.stats["current_doc_trans_flatten_time"] = 0
-                        self.stats["current_doc_trans_api_time"] = 0
-
-        elif "trans_api_start" in metadata:
-            self._trans_api_chunk_start = now
-            chunk_size_mb = metadata["trans_api_start"] / (1024 * 1024)
-            self.stats["current_doc_trans_mb"] = self.stats.get("current_doc_trans_mb", 0) + chunk_size_mb
-
-        elif "trans_api_done" in metadata:
-            if hasattr(self, '_trans_api_chunk_start'):
-                duration = now - self._trans_api_chunk_start
-                self.stats["current_doc_trans_api_time"] = self.stats.get("current_doc_trans_api_time", 0) + duration
-                self.stats["current_doc_trans_time"] = self.stats.get("current_doc_trans_time", 0) + duration
-
-        elif "trans_flatten_start" in metadata:
-            self._trans_flatten_start = now
-
-        elif "trans_flatten_done" in metadata:
-            if hasattr(self, '_trans_flatten_start'):
-                duration = now - self._trans_flatten_start
-                self.stats["current_doc_trans_flatten_time"] = self.stats.get("current_doc_trans_flatten_time", 0) + duration
-                self.stats["current_doc_trans_time"] = self.stats.get("current_doc_trans_time", 0) + duration
-
-        elif "pages" in metadata:
-            # Document started
-            self._page_start_time = now
-            self._current_doc_pages = metadata["pages"]
-            # Track load time from document initialization start to first metadata page report
-            if hasattr(self, '_doc_load_start_time'):
-                load_duration = now - self._doc_load_start_time
-                if self._save_size_mb > 0:
-                    self.stats["avg_time_per_mb_load"] = (self.stats["avg_time_per_mb_load"] * 0.9) + ((load_duration / self._save_size_mb) * 0.1)
+                    # Use a fixed guess for load time per MB if it's the first run
+                    load_avg = self.stats.get("avg_time_per_mb_load", 0.1)
+                    
+                    # Written to history by finish_doc_metrics, once translation is accounted for too
+                    state["history_sample"] = (
+                        doc_pages, 
+                        state.get("save_size_mb", 0), 
+                        doc_page_avg, 
+                        time_per_page_save,
+                        load_avg
+                    )
+
+        elif event.kind == STAGE_START and stage == "translate_api":
+            # Chunks can be in flight together: time the span during which any chunk is in flight
+            if not state.get("trans_api_in_flight"):
+                state["trans_api_chunk_start"] = now
+            state["trans_api_in_flight"] = state.get("trans_api_in_flight", 0) + 1
+            chunk_size_mb = event.fields["bytes"] / (1024 * 1024)
+            state["trans_mb"] = state.get("trans_mb", 0) + chunk_size_mb
+
+        elif event.kind == STAGE_END and stage == "translate_api":
+            state["trans_api_in_flight"] = max(0, state.get("trans_api_in_flight", 0) - 1)
+            if "trans_api_chunk_start" in state and not state["trans_api_in_flight"]:
+                duration = now - state["trans_api_chunk_start"]
+                state["trans_api_time"] = state.get("trans_api_time", 0) + duration
+                state["trans_time"] = state.get("trans_time", 0) + duration
+
+        elif event.kind == STAGE_END and stage == "translate_prepare":
+            duration = event.fields["seconds"]
+            state["trans_flatten_time"] = state.get("trans_flatten_time", 0) + duration
+            state["trans_time"] = state.get("trans_time", 0) + duration
+
+        elif event.kind == DOCUMENT_START:
+            state["page_start_time"] = now
+            state["pages"] = event.fields["pages"]
+            # Track load time from document initialization start to the document start event
+            if "load_start_time" in state:
+                load_duration = now - state["load_start_time"]
+                if state.get("save_size_mb", 0) > 0:
+                    self.stats["avg_time_per_mb_load"] = (self.stats["avg_time_per_mb_load"] * 0.9) + ((load_duration / state["save_size_mb"]) * 0.1)
 
         # Update visual estimation if processing
         if self.is_processing:
             self.update_estimation_ui()
 
+    def finish_doc_metrics(self, doc):
+        """Writes the finished document's sample to the history file and drops its timers"""
+        with self.ui_lock:
+            state = self.doc_states.pop(doc, {})
+        if "history_sample" in state:
+            self.append_history_sample(*state["history_sample"], trans=state)
+
     def update_estimation_ui(self):
+        self.run_in_ui(self._update_estimation_ui)
+
+    def _update_estimation_ui(self):
         # We can update the UI even before hitting Start if we have global stats
         elapsed = (time.time() - self.start_time_global) if hasattr(self, 'start_time_global') else 0
         
@@ -465,14 +514,21 @@ class LocalFileProcessorApp:
         files_left = len(self.files_to_process)
         
         # Predicted Translation Cost
-        # Since we use Flattened Image (Zoom 2.0), each page is ~1.5MB to 2.5MB
-        avg_mb_per_page = 2.0
-        projected_trans_mb = pages_left * avg_mb_per_page if self.config.get('translation', {}).get('enabled', False) else 0
-        m3 = self.stats.get("slope_trans", 1.5)
-        b3 = self.stats.get("intercept_trans", 0.5)
-        translation_time = (projected_trans_mb * m3) + (files_left * b3)
-
-        remaining = load_time + (files_left * (b1 + b2)) + (pages_left * (balanced_m1 + m2)) + translation_time
+        # Since we use Flattened Image (Zoom 2.0), each page is ~1.5MB to 2.5MB; in "text" mode only a few KB of text
+        avg_mb_per_page = 0.005 if self.config.get('translation', {}).get('mode') == "text" else 2.0
+        translation_time = 0
+        if self.config.get('translation', {}).get('enabled', False):
+            # Everything not redacted yet plus what already waits in the translation queue
+            projected_trans_mb = (pages_left + self.stats.get("trans_pages_pending", 0)) * avg_mb_per_page
+            m3 = self.stats.get("slope_trans", 1.5)
+            b3 = self.stats.get("intercept_trans", 0.5)
+            translation_time = (projected_trans_mb * m3) + (files_left * b3)
+
+        remaining = load_time + (files_left * (b1 + b2)) + (pages_left * (balanced_m1 + m2))
+        # Documents processed side by side share the remaining work
+        remaining = remaining / max(1, min(self.document_workers, files_left))
+        # Translation runs in its own stage, overlapping the redaction: the slower stage sets the pace
+        remaining = max(remaining, translation_time)
         
         if not self.history_calibrated:
             status_text = "Est. Remaining: Calibrating..."
@@ -492,6 +548,9 @@ class LocalFileProcessorApp:
 
     def update_file_ui_status(self, filename, success=True, simulated=False):
         """Moves a file from pending to processed listbox"""
+        self.run_in_ui(self._update_file_ui_status, filename, success, simulated)
+
+    def _update_file_ui_status(self, filename, success=True, simulated=False):
         try:
             # Remove from pending
             items = self.list_pending.get(0, tk.END)
@@ -505,7 +564,6 @@ class LocalFileProcessorApp:
             tag = " (Simulated)" if simulated else f" ({status})"
             self.list_processed.insert(tk.END, f"{filename}{tag}")
             self.list_processed.see(tk.END)
-            self.root.update()
         except Exception as e:
             print(f"UI Update error: {e}")
 
@@ -614,7 +672,7 @@ class LocalFileProcessorApp:
             output_folder = os.path.join(self.source_folder, "processed")
             
             # Filter files first
-            raw_files = [f for f in os.listdir(self.source_folder) if not f.startswith('.') and f.lower().endswith(('.pdf', '.png', '.jpg', '.jpeg', '.tiff'))]
+            raw_files = [f for f in os.listdir(self.source_folder) if not f.startswith('.') and f.lower().endswith(SUPPORTED_EXTENSIONS)]
             
             if not raw_files:
                 self.log_message("No supported documents found in selected folder.")
@@ -631,7 +689,7 @@ class LocalFileProcessorApp:
                     expected_output = os.path.join(output_folder, f"anonymized_{f}")
                     if os.path.exists(expected_output):
                         self.processed_files.append(f)
-                        self.list_processed.insert(tk.END, f"{f} (Completed)")
+                        self.run_in_ui(self.list_processed.insert, tk.END, f"{f} (Completed)")
                     else:
                         # Update Weight & Pages only for documents we will actually process
                         size_mb = os.path.getsize(full_path) / (1024 * 1024)
@@ -646,7 +704,7 @@ class LocalFileProcessorApp:
                         except: self.stats["total_pages_global"] += 1
 
                         self.files_to_process.append(f)
-                        self.list_pending.insert(tk.END, f)
+                        self.run_in_ui(self.list_pending.insert, tk.END, f)
 
                     # Update UI Estimation incrementally
                     self.update_estimation_ui()
@@ -659,6 +717,96 @@ class LocalFileProcessorApp:
             self.log_message(f"Error listing files: {e}")
             messagebox.showerror("Error", f"Failed to list files: {e}")
 
+    def process_file(self, processor, idx, total_files, filename, output_folder, global_kws, translation_queue=None):
+        """
+        Anonymizes one document. Returns True on success.
+        With a `translation_queue`, PDFs are handed over to the translation stage and finished there,
+        so the worker can start redacting the next document right away.
+        """
+        processor.log_callback = lambda message: self.log_message(message, doc=filename)
+        self.log_message(f"Processing {idx+1}/{total_files}: {filename}")
+        file_path = os.path.join(self.source_folder, filename)
+        output_path = os.path.join(output_folder, f"anonymized_{filename}")
+        
+        success = False
+        callbacks = []
+        try:
+            callbacks = self.watch_processor(processor, filename)
+            file_size = os.path.getsize(file_path) / (1024 * 1024)
+
+            # Mark start of doc for load time tracking
+            with self.ui_lock:
+                self.doc_states[filename] = {"load_start_time": time.time(), "save_size_mb": file_size}
+
+            # Merge keywords for this specific file
+            specific_kws = self.keywords_mapping.get(filename, [])
+            merged_terms = list(set(global_kws + specific_kws))
+            
+            if processor.stream_window_pages:
+                # Streaming: pages are flushed to disk as they are finished, translation reads the file
+                processor.process_document_to_file(file_path, output_path, custom_terms=merged_terms)
+                redacted = output_path
+            else:
+                # Direct RAM-only processing
+                redacted = processor.process_document(file_path, custom_terms=merged_terms)
+                if redacted:
+                    with open(output_path, 'wb') as f:
+                        f.write(redacted)
+            
+            if redacted:
+                success = True
+                
+                # Translation Step (after anonymization and digitalization) runs in its own stage
+                if translation_queue is not None and filename.lower().endswith('.pdf'):
+                    with self.ui_lock:
+                        pages = self.doc_states.get(filename, {}).get("pages", 0)
+                        self.stats["trans_pages_pending"] += pages
+                    # Blocks when the translator falls behind, which bounds the redacted documents held in RAM
+                    translation_queue.put((filename, redacted, output_folder, pages))
+                    return success
+            else:
+                 self.log_message(f"Completed {filename} but no content returned?", doc=filename)
+
+        except Exception as e:
+            print(f"Error processing {filename}: {e}")
+            self.log_message(f"Failed {filename}: {str(e)[:50]}...", doc=filename)
+        finally:
+            self.unwatch_processor(processor, callbacks)
+        
+        self.finish_file(filename, success)
+        return success
+
+    def translate_file(self, processor, filename, redacted, output_folder, pages):
+        """Translation stage: translates one anonymized document (bytes, or its path when streamed) and finishes it"""
+        processor.log_callback = lambda message: self.log_message(message, doc=filename)
+        trans_config = self.config.get('translation', {})
+        callbacks = []
+        try:
+            callbacks = self.watch_processor(processor, filename)
+            target_lang = trans_config.get('target_language_code', 'en')
+            # translate_document now returns a list of (label, bytes)
+            results = processor.translate_document(redacted, target_language=target_lang)
+            self.log_message(write_translation_outputs(results, output_folder, filename, target_lang), doc=filename)
+        except Exception as te:
+            self.log_message(f"Translation error: {str(te)}", doc=filename)
+        finally:
+            self.unwatch_processor(processor, callbacks)
+            with self.ui_lock:
+                self.stats["trans_pages_pending"] -= pages
+            self.finish_file(filename, True)
+
+    def finish_file(self, filename, success):
+        """Records the document's metrics and moves it to the processed list"""
+        self.finish_doc_metrics(filename)
+        
+        # Update UI status immediately after each file
+        self.update_file_ui_status(filename, success=success)
+        with self.ui_lock:
+            self.update_estimation_ui()
+            
+            # Persist metrics after each document so progress isn't lost on cancel
+            self.save_performance_metrics()
+
     def start_processing_thread(self):
         # Run in thread to not freeze UI during long API calls
         thread = threading.Thread(target=self.start_processing)
@@ -666,17 +814,18 @@ class LocalFileProcessorApp:
 
     def start_processing(self):
         if not self.files_to_process:
-            messagebox.showinfo("Info", "No files to process.")
+            self.run_in_ui(messagebox.showinfo, "Info", "No files to process.")
             return
         
         self.is_processing = True
         self.should_stop = False
-        self.btn_start.config(state=tk.DISABLED)
-        self.btn_stop.config(state=tk.NORMAL, bg="#ffcdd2")
+        self.run_in_ui(lambda: self.btn_start.config(state=tk.DISABLED))
+        self.run_in_ui(lambda: self.btn_stop.config(state=tk.NORMAL, bg="#ffcdd2"))
         
         # Reset Stats for the current run
         self.stats["pages_done_global"] = 0
         self.stats["size_done_mb_global"] = 0
+        self.stats["trans_pages_pending"] = 0
         
         # We already pre-scanned, so we can start immediately
         self.log_message(f"Starting batch: {self.stats['total_pages_global']} pages total.")
@@ -690,103 +839,81 @@ class LocalFileProcessorApp:
         try:
             # REAL MODE - Direct DLP (Transient)
             self.log_message("Initializing DLP Processor...")
-            cloud_config = self.config.get('google_cloud', {})
-            processor = ClinicalDocumentProcessor(
-                project_id=cloud_config.get('project_id'),
-                location=cloud_config.get('location'),
-                credentials_file=cloud_config.get('service_account_key_file'),
-                log_callback=self.log_message
-            )
+            processing_config = self.config.get('processing', {})
+            self.document_workers = max(1, min(int(processing_config.get('document_workers', 1)), len(files_snapshot)))
+            if processing_config.get('event_log'):
+                self.event_log = JsonlExporter(processing_config['event_log'])
+            
+            # One processor per worker, so each routes its log lines to the document it is working on
+            processors = queue.Queue()
+            for _ in range(self.document_workers):
+                processors.put(ClinicalDocumentProcessor.from_config(self.config, log_callback=self.log_message))
             
             # Setup output folder
             output_folder = os.path.join(self.source_folder, "processed")
             os.makedirs(output_folder, exist_ok=True)
 
             total_files = len(files_snapshot)
-            success_count = 0
+            pending = iter(enumerate(files_snapshot))
+            pending_lock = threading.Lock()
+            results = []
             
-            for idx, filename in enumerate(files_snapshot):
-                if self.should_stop:
-                    self.log_message("Processing halted by user.")
-                    break
-                    
-                self.log_message(f"Processing {idx+1}/{total_files}: {filename}")
-                file_path = os.path.join(self.source_folder, filename)
-                file_size = os.path.getsize(file_path) / (1024 * 1024)
-                output_path = os.path.join(output_folder, f"anonymized_{filename}")
-                
-                # Mark start of doc for load time tracking
-                self._doc_load_start_time = time.time()
-                self._save_size_mb = file_size 
-                
-                success = False
-                try:
-                    # Merge keywords for this specific file
-                    specific_kws = self.keywords_mapping.get(filename, [])
-                    merged_terms = list(set(global_kws + specific_kws))
-                    
-                    # Direct RAM-only processing
-                    redacted_bytes = processor.process_document(file_path, custom_terms=merged_terms)
-                    
-                    if redacted_bytes:
-                        with open(output_path, 'wb') as f:
-                            f.write(redacted_bytes)
-                        
-                        # Translation Step (after anonymization and digitalization)
-                        trans_config = self.config.get('translation', {})
-                        if trans_config.get('enabled', False) and filename.lower().endswith('.pdf'):
-                            try:
-                                target_lang = trans_config.get('target_language_code', 'en')
-                                # translate_document now returns a list of (label, bytes)
-                                results = processor.translate_document(redacted_bytes, target_language=target_lang)
-                                
-                                if len(results) == 1 and results[0][0] == "":
-                                    # Case A: Small document (<= 20 pages) - Save normally in /processed
-                                    _, trans_bytes = results[0]
-                                    trans_output_path = os.path.join(output_folder, f"translated_{target_lang}_{filename}")
-                                    with open(trans_output_path, 'wb') as f:
-                                        f.write(trans_bytes)
-                                    self.log_message(f"Translated copy saved: {os.path.basename(trans_output_path)}")
-                                else:
-                                    # Case B: Large document (> 20 pages) - Save in a dedicated subfolder
-                                    folder_base = os.path.splitext(filename)[0]
-                                    subfolder_name = f"{target_lang}_anonymized_{folder_base}"
-                                    subfolder_path = os.path.join(output_folder, subfolder_name)
-                                    os.makedirs(subfolder_path, exist_ok=True)
-                                    
-                                    for label, trans_bytes in results:
-                                        # Naming convention: 00-20_translated_en_filename.pdf
-                                        chunk_filename = f"{label}_translated_{target_lang}_{filename}"
-                                        trans_output_path = os.path.join(subfolder_path, chunk_filename)
-                                        with open(trans_output_path, 'wb') as f:
-                                            f.write(trans_bytes)
-                                            
-                                    self.log_message(f"Large document split into {len(results)} translated chunks in: {subfolder_name}")
-                                    
-                            except Exception as te:
-                                self.log_message(f"Translation error: {str(te)}")
-                        
-                        success = True
-                        success_count += 1
-                    else:
-                         self.log_message(f"Completed {filename} but no content returned?")
-
-                except Exception as e:
-                    print(f"Error processing {filename}: {e}")
-                    self.log_message(f"Failed {filename}: {str(e)[:50]}...")
-                
-                # Update UI status immediately after each file
-                self.update_file_ui_status(filename, success=success)
-                self.update_estimation_ui()
-                
-                # Persist metrics after each document so progress isn't lost on cancel
-                self.save_performance_metrics()
+            # Translation stage: a background thread with its own processor translates finished
+            # documents while the redaction workers move on to the next ones
+            translation_queue = None
+            translator = None
+            if self.config.get('translation', {}).get('enabled', False):
+                translation_queue = queue.Queue(maxsize=self.document_workers)
+                translation_processor = ClinicalDocumentProcessor.from_config(self.config, log_callback=self.log_message)
+
+                def translation_worker():
+                    while True:
+                        item = translation_queue.get()
+                        if item is None:
+                            return
+                        self.translate_file(translation_processor, *item)
+
+                translator = threading.Thread(target=translation_worker, name="translation-stage", daemon=True)
+                translator.start()
+            
+            def worker():
+                processor = processors.get()
+                # Stop only prevents new documents from starting; documents in progress are drained
+                while not self.should_stop:
+                    with pending_lock:
+                        item = next(pending, None)
+                    if item is None:
+                        return
+                    idx, filename = item
+                    results.append(self.process_file(processor, idx, total_files, filename, output_folder, global_kws,
+                                                     translation_queue=translation_queue))
+
+            if self.document_workers > 1:
+                self.log_message(f"Processing up to {self.document_workers} documents in parallel.")
+            try:
+                with ThreadPoolExecutor(max_workers=self.document_workers) as pool:
+                    futures = [pool.submit(worker) for _ in range(self.document_workers)]
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"Worker error: {e}")
+                        self.log_message(f"Worker error: {e}")
+            finally:
+                if translator is not None:
+                    # Queued translations are still written, even after Stop
+                    translation_queue.put(None)
+                    translator.join()
+
+            success_count = sum(1 for ok in results if ok)
+            if self.should_stop and len(results) < total_files:
+                self.log_message("Processing halted by user.")
 
             # Final persistence
             self.save_performance_metrics()
 
             self.log_message(f"Batch Processing Complete! ({success_count} success, {total_files - success_count} failed)")
-            self.time_var.set(f"Finished in {self.format_time(time.time() - self.start_time_global)}")
+            self.run_in_ui(self.time_var.set, f"Finished in {self.format_time(time.time() - self.start_time_global)}")
 
         except Exception as e:
             full_error = str(e)
@@ -794,14 +921,14 @@ class LocalFileProcessorApp:
             self.log_message(f"Error: {full_error}")
             
         finally:
+            if self.event_log:
+                self.event_log.close()
+                self.event_log = None
             self.is_processing = False
             self.should_stop = False
             self.files_to_process = []
-            try:
-                self.root.after(0, lambda: self.btn_start.config(state=tk.NORMAL))
-                self.root.after(0, lambda: self.btn_stop.config(state=tk.DISABLED, bg="#f5f5f5"))
-            except:
-                pass
+            self.run_in_ui(lambda: self.btn_start.config(state=tk.NORMAL))
+            self.run_in_ui(lambda: self.btn_stop.config(state=tk.DISABLED, bg="#f5f5f5"))
             
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,72 @@
+import sys
+import time
+import argparse
+import fitz  # PyMuPDF
+
+from benchmark_upload_profiles import collect_pdfs
+from dlp_processor import OUTPUT_PROFILES, encode_output_image, insert_flat_image
+
+# Compares the output profiles of ClinicalDocumentProcessor on a sample corpus: output size per
+# page, encode time and save time, with the full save (garbage=4) and the fast save (garbage=1).
+# Runs locally only (no API calls); pages are rendered at the same 3x zoom as the real output.
+
+def build_output(pages, profile, jpeg_quality):
+    """Flattened output document of `pages` (rect, pixmap) with one profile. Returns (doc, encode_s)."""
+    out = fitz.open()
+    encode_s = 0.0
+    for rect, pix in pages:
+        t0 = time.time()
+        data = encode_output_image(pix, profile, jpeg_quality)
+        encode_s += time.time() - t0
+        page = out.new_page(width=rect.width, height=rect.height)
+        insert_flat_image(page, page.rect, data)
+    return out, encode_s
+
+def benchmark(pdfs, max_pages, zoom, jpeg_quality):
+    mat = fitz.Matrix(zoom, zoom)
+    pages = []
+    for path in pdfs:
+        with fitz.open(path) as doc:
+            for i in range(min(len(doc), max_pages)):
+                page = doc.load_page(i)
+                pages.append((page.rect, page.get_pixmap(matrix=mat)))
+    print(f"   {len(pages)} pages rendered")
+
+    results = {}
+    for profile in OUTPUT_PROFILES:
+        stats = {"pages": len(pages)}
+        for mode, garbage in (("full", 4), ("fast", 1)):
+            # A fresh document each time: a save after the first one has less to compress
+            out, stats["encode_s"] = build_output(pages, profile, jpeg_quality)
+            t0 = time.time()
+            data = out.tobytes(garbage=garbage, deflate=True)
+            stats[f"save_{mode}_s"] = time.time() - t0
+            stats["bytes"] = len(data)
+            out.close()
+        results[profile] = stats
+        print(f"   {profile} done")
+    return results
+
+def print_report(results):
+    print(f"\n{'Profile':<10} {'KB/page':>9} {'Encode ms/pg':>13} {'Save ms/pg':>11} {'Fast save ms/pg':>16}")
+    for name, s in results.items():
+        n = s["pages"]
+        print(f"{name:<10} {s['bytes'] / n / 1024:>9.1f} {s['encode_s'] * 1000 / n:>13.1f} "
+              f"{s['save_full_s'] * 1000 / n:>11.1f} {s['save_fast_s'] * 1000 / n:>16.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare output profiles (size, encode time, save time).")
+    parser.add_argument("path", help="A PDF or a folder of sample PDFs")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per document (default: 5)")
+    parser.add_argument("--zoom", type=float, default=3.0)
+    parser.add_argument("--jpeg-quality", type=int, default=75)
+    args = parser.parse_args()
+
+    pdfs = collect_pdfs(args.path)
+    if not pdfs:
+        print("No PDF found.")
+        sys.exit(1)
+
+    print(f"1. Rendering {len(pdfs)} document(s), up to {args.pages} pages each...")
+    results = benchmark(pdfs, args.pages, args.zoom, args.jpeg_quality)
+    print_report(results)
@@ -0,0 +1,101 @@
+import sys
+import time
+import random
+import argparse
+import fitz  # PyMuPDF
+from google.cloud import vision
+
+from dlp_processor import ClinicalDocumentProcessor, write_text_layer
+
+# Compares the searchable OCR overlay writers on dense pages: the former path (proto-plus walk of
+# the Vision response, one insert_text call per word) against the current one (raw protobuf walk,
+# one TextWriter per page). Runs locally only: the Vision responses are synthetic.
+
+SAMPLE_WORDS = ["Glucose", "5.4", "mmol/L", "Hemoglobin", "13.8", "g/dL", "WBC", "7.2", "x10^9/L", "Ref."]
+
+def fake_response(words_per_page, zoom):
+    """A Vision response laid out like a dense lab report (rows of short words)."""
+    rng = random.Random(words_per_page)
+    cols = 12
+    paragraphs = []
+    for row in range((words_per_page + cols - 1) // cols):
+        words = []
+        for col in range(min(cols, words_per_page - row * cols)):
+            text = rng.choice(SAMPLE_WORDS)
+            x0, y0 = int((30 + col * 46) * zoom), int((30 + row * 6.5) * zoom)
+            x1, y1 = x0 + int(40 * zoom), y0 + int(5 * zoom)
+            vertices = [vision.Vertex(x=x0, y=y0), vision.Vertex(x=x1, y=y0),
+                        vision.Vertex(x=x1, y=y1), vision.Vertex(x=x0, y=y1)]
+            words.append(vision.Word(symbols=[vision.Symbol(text=c) for c in text],
+                                     bounding_box=vision.BoundingPoly(vertices=vertices)))
+        paragraphs.append(vision.Paragraph(words=words))
+    response = vision.AnnotateImageResponse(full_text_annotation=vision.TextAnnotation(
+        pages=[vision.Page(blocks=[vision.Block(paragraphs=paragraphs)])]))
+    # Round trip so the message looks like one received from the API
+    return vision.AnnotateImageResponse.deserialize(vision.AnnotateImageResponse.serialize(response))
+
+def per_word_parse(vision_response, zoom):
+    """The former _ocr_words: nested loops over the proto-plus wrappers."""
+    words = []
+    if vision_response.full_text_annotation:
+        for page_v in vision_response.full_text_annotation.pages:
+            for block in page_v.blocks:
+                for paragraph in block.paragraphs:
+                    for word in paragraph.words:
+                        word_text = "".join([l.text for l in word.symbols])
+                        vertices = word.bounding_box.vertices
+                        x0 = min(v.x for v in vertices) / zoom
+                        y0 = min(v.y for v in vertices) / zoom
+                        x1 = max(v.x for v in vertices) / zoom
+                        y1 = max(v.y for v in vertices) / zoom
+                        words.append((word_text, x0, y0, x1, y1))
+    return words
+
+def per_word_overlay(page, words):
+    """The former _insert_ocr_words: one insert_text call per word."""
+    for word_text, x0, y0, x1, y1 in words:
+        page.insert_text((x0, y1), word_text, fontsize=(y1-y0)*0.8, render_mode=3)
+
+def run(parse, overlay, responses, zoom):
+    stats = {"parse_s": 0.0, "overlay_s": 0.0, "save_s": 0.0}
+    doc = fitz.open()
+    for response in responses:
+        t0 = time.time()
+        words = parse(response, zoom)
+        t1 = time.time()
+        overlay(doc.new_page(), words)
+        t2 = time.time()
+        stats["parse_s"] += t1 - t0
+        stats["overlay_s"] += t2 - t1
+    t0 = time.time()
+    data = doc.tobytes(garbage=4, deflate=True)
+    stats["save_s"] = time.time() - t0
+    stats["bytes"] = len(data)
+    stats["words"] = sum(len(p.get_text("words")) for p in fitz.open("pdf", data))
+    doc.close()
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the per-word and the bulk OCR text overlay writers.")
+    parser.add_argument("--words", type=int, default=3000, help="Words per page (default: 3000, a dense lab report)")
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--zoom", type=float, default=3.0)
+    args = parser.parse_args()
+
+    print(f"1. Building {args.pages} synthetic Vision responses with {args.words} words each...")
+    responses = [fake_response(args.words, args.zoom) for _ in range(args.pages)]
+
+    results = {
+        "per-word": run(per_word_parse, per_word_overlay, responses, args.zoom),
+        # _ocr_words does not use the processor's state
+        "bulk": run(lambda r, z: ClinicalDocumentProcessor._ocr_words(None, r, z), write_text_layer, responses, args.zoom),
+    }
+    if results["per-word"]["words"] != results["bulk"]["words"]:
+        print("Warning: the two writers produced a different number of searchable words")
+        sys.exit(1)
+
+    n = args.pages
+    print(f"\n{'Writer':<10} {'Parse ms/pg':>12} {'Overlay ms/pg':>14} {'Save ms/pg':>11} {'KB/page':>9}")
+    for name, s in results.items():
+        print(f"{name:<10} {s['parse_s'] * 1000 / n:>12.1f} {s['overlay_s'] * 1000 / n:>14.1f} "
+              f"{s['save_s'] * 1000 / n:>11.1f} {s['bytes'] / n / 1024:>9.1f}")
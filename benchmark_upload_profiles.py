@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import time
+import argparse
+import fitz  # PyMuPDF
+
+from dlp_processor import ClinicalDocumentProcessor, UPLOAD_ENCODINGS, encode_image
+
+# Compares the upload payload profiles of ClinicalDocumentProcessor on a sample corpus:
+# bytes per page and encode time for every profile and, with --inspect, DLP detection
+# recall against the lossless PNG baseline (uses the DLP API, so it costs quota).
+
+def collect_pdfs(path):
+    if os.path.isdir(path):
+        return [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.lower().endswith(".pdf")]
+    return [path]
+
+def recalled(baseline_rects, rects):
+    """Number of baseline boxes overlapped by at least one box of the profile."""
+    return sum(1 for b in baseline_rects if any(b.intersects(r) for r in rects))
+
+def benchmark(pdfs, max_pages, zoom, jpeg_quality, processor=None, inspect_config=None):
+    results = {name: {"pages": 0, "bytes": 0, "encode_s": 0.0, "baseline_boxes": 0, "recalled_boxes": 0}
+               for name in UPLOAD_ENCODINGS}
+    mat = fitz.Matrix(zoom, zoom)
+
+    for path in pdfs:
+        with fitz.open(path) as doc:
+            for i in range(min(len(doc), max_pages)):
+                pix = doc.load_page(i).get_pixmap(matrix=mat)
+                baseline_rects = None
+                for name in UPLOAD_ENCODINGS:
+                    t0 = time.time()
+                    data = encode_image(pix, name, jpeg_quality)
+                    stats = results[name]
+                    stats["encode_s"] += time.time() - t0
+                    stats["bytes"] += len(data)
+                    stats["pages"] += 1
+
+                    if processor:
+                        findings = processor._inspect_image(data, inspect_config, encoding=name)
+                        rects = processor._image_findings_to_rects(findings, zoom)
+                        if baseline_rects is None:
+                            baseline_rects = rects  # "png" comes first: the lossless reference
+                        stats["baseline_boxes"] += len(baseline_rects)
+                        stats["recalled_boxes"] += recalled(baseline_rects, rects)
+                print(f"   {os.path.basename(path)} page {i+1} done")
+    return results
+
+def print_report(results, inspected):
+    print(f"\n{'Profile':<10} {'KB/page':>9} {'Encode ms/page':>15}" + (f" {'Recall vs png':>14}" if inspected else ""))
+    for name, s in results.items():
+        if not s["pages"]:
+            continue
+        line = f"{name:<10} {s['bytes'] / s['pages'] / 1024:>9.1f} {s['encode_s'] * 1000 / s['pages']:>15.1f}"
+        if inspected:
+            recall = s["recalled_boxes"] / s["baseline_boxes"] if s["baseline_boxes"] else 1.0
+            line += f" {recall:>13.1%}"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare upload payload profiles (size, encode time, DLP recall).")
+    parser.add_argument("path", help="A PDF or a folder of sample PDFs")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per document (default: 5)")
+    parser.add_argument("--zoom", type=float, default=3.0)
+    parser.add_argument("--jpeg-quality", type=int, default=85)
+    parser.add_argument("--inspect", action="store_true", help="Also run DLP inspection to measure recall")
+    parser.add_argument("--config", default="config.json")
+    args = parser.parse_args()
+
+    pdfs = collect_pdfs(args.path)
+    if not pdfs:
+        print("No PDF found.")
+        sys.exit(1)
+
+    processor = inspect_config = None
+    if args.inspect:
+        with open(args.config, 'r') as f:
+            processor = ClinicalDocumentProcessor.from_config(json.load(f))
+        inspect_config = processor.build_inspect_config()
+
+    print(f"1. Encoding {len(pdfs)} document(s), up to {args.pages} pages each...")
+    results = benchmark(pdfs, args.pages, args.zoom, args.jpeg_quality, processor, inspect_config)
+    print_report(results, args.inspect)
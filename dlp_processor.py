@@ -1,37 +1,385 @@
 import os
 import io
+import sys
+import json
 import time
+import struct
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import fitz  # PyMuPDF
 from google.cloud import dlp_v2
 from google.cloud import vision
 from google.cloud import translate_v3 as translate
 from typing import List
 
+from api_calls import shared_callers, split_api_limits
+from page_pipeline import PagePipeline, PageTask, Stage
+from processor_events import (API_CALL, DOCUMENT_START, EVENT_KINDS, PAGE_DONE, PAGE_STAGE, REPORT, EventBus,
+                              JsonlExporter, message_size)
+from page_cache import PageCheckpoint, PageResultCache, fingerprint, open_cache
+
+# PyMuPDF is not thread-safe: every call into fitz from a pipeline thread holds this lock
+FITZ_LOCK = threading.RLock()
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg', '.tiff')
+INSPECTION_MODES = ("image", "text_layer", "single_ocr")
+
+# Payload profiles for page images sent to DLP and Vision, with the DLP byte type of each
+UPLOAD_ENCODINGS = {
+    "png": dlp_v2.ByteContentItem.BytesType.IMAGE_PNG,       # lossless colour (default)
+    "gray_png": dlp_v2.ByteContentItem.BytesType.IMAGE_PNG,  # lossless grayscale
+    "jpeg": dlp_v2.ByteContentItem.BytesType.IMAGE_JPEG,     # lossy colour, see jpeg_quality
+    "bilevel": dlp_v2.ByteContentItem.BytesType.IMAGE_PNG,   # black & white, for scanned reports
+}
+# Adaptive resolution: pages escalate from the coarse to the full zoom when their text layer
+# has words smaller than this (points) or their coarse OCR confidence is below this
+SMALL_TEXT_HEIGHT = 8.0
+LOW_OCR_CONFIDENCE = 0.8
+
+# Batched DLP text inspection: several pages share one request up to this payload size
+# (the synchronous inspect_content limit is 0.5 MB), separated by a blank line
+DLP_MAX_TEXT_BYTES = 400 * 1024
+PAGE_TEXT_SEPARATOR = "\n\n"
+
+# Translation chunks: payload limit per request (the API limit is 40MiB) and the size
+# allowed per page on top of its image (page object, content stream, resources)
+TRANSLATION_MAX_PAYLOAD_BYTES = 30 * 1024 * 1024
+TRANSLATION_PAGE_OVERHEAD = 4 * 1024
+
+# "document" uploads image-only PDF chunks to translate_document; "text" sends the words of our
+# OCR text layer through translate_text and rebuilds the translated PDF locally
+TRANSLATION_MODES = ("document", "text")
+# translate_text: recommended maximum per request (codepoints) and segments per request
+TRANSLATION_MAX_TEXT_CODEPOINTS = 30000
+TRANSLATION_MAX_TEXT_SEGMENTS = 1024
+# Translated blocks shrink down to this font size (points) before they are allowed to run past their box
+TRANSLATION_MIN_FONT_SIZE = 4.0
+
+# Vision batch_annotate_images: at most 16 images per request, and we keep the payload under ~8 MB
+VISION_MAX_BATCH_IMAGES = 16
+VISION_MAX_BATCH_BYTES = 8 * 1024 * 1024
+
+BILEVEL_THRESHOLD = 160  # gray values below this become black
+_BILEVEL_TABLE = bytes(0 if v < BILEVEL_THRESHOLD else 255 for v in range(256))
+
+def encode_image(pix, encoding: str = "png", jpeg_quality: int = 85) -> bytes:
+    """Encodes a PyMuPDF pixmap with one of the UPLOAD_ENCODINGS profiles."""
+    if encoding == "png":
+        return pix.tobytes("png")
+    if encoding == "jpeg":
+        return pix.tobytes("jpeg", jpg_quality=jpeg_quality)
+    gray = fitz.Pixmap(fitz.csGRAY, pix) if pix.n >= 3 else pix
+    if encoding == "gray_png":
+        return gray.tobytes("png")
+    if encoding == "bilevel":
+        # Threshold to pure black/white; the long runs deflate to a fraction of the gray size
+        samples = gray.samples.translate(_BILEVEL_TABLE)
+        return fitz.Pixmap(fitz.csGRAY, gray.width, gray.height, samples, False).tobytes("png")
+    raise ValueError(f"Unknown encoding '{encoding}' (expected one of {tuple(UPLOAD_ENCODINGS)})")
+
+# Font of the invisible OCR text layer (shared: every use is under FITZ_LOCK)
+OVERLAY_FONT = fitz.Font("helv")
+
+def write_text_layer(page, words: List[tuple]):
+    """
+    Writes (text, x0, y0, x1, y1) words as invisible text, all in one TextWriter: a single
+    content stream and font resource per page instead of one insert_text call per word.
+    """
+    if not words:
+        return
+    writer = fitz.TextWriter(page.rect)
+    for word_text, x0, y0, x1, y1 in words:
+        writer.append((x0, y1), word_text, font=OVERLAY_FONT, fontsize=max(1.0, (y1 - y0) * 0.8))
+    writer.write_text(page, render_mode=3)
+
+# Profiles for the flattened page images written into the output PDF
+OUTPUT_PROFILES = ("png", "gray_png", "jpeg", "gray_jpeg", "bilevel")
+# "1" for black, "0" for white: thresholded rows become PBM bits with a single int() call
+_PBM_BITS_TABLE = bytes(ord("1") if v < BILEVEL_THRESHOLD else ord("0") for v in range(256))
+
+def encode_output_image(pix, profile: str = "png", jpeg_quality: int = 75) -> bytes:
+    """
+    Encodes a flattened page for the output PDF with one of the OUTPUT_PROFILES.
+    "bilevel" returns a 1-bit PBM (P4) that insert_flat_image stores as a 1-bit Flate image
+    (PyMuPDF has no CCITT or JBIG2 encoder).
+    """
+    if profile in ("png", "gray_png", "jpeg"):
+        return encode_image(pix, profile, jpeg_quality)
+    gray = fitz.Pixmap(fitz.csGRAY, pix) if pix.n >= 3 else pix
+    if profile == "gray_jpeg":
+        return gray.tobytes("jpeg", jpg_quality=jpeg_quality)
+    if profile == "bilevel":
+        w, h = gray.width, gray.height
+        bits = gray.samples.translate(_PBM_BITS_TABLE)
+        pad = b"0" * (-w % 8)
+        rows = [int(bits[y * w:(y + 1) * w] + pad, 2).to_bytes((w + 7) // 8, "big") for y in range(h)]
+        return f"P4\n{w} {h}\n".encode("ascii") + b"".join(rows)
+    raise ValueError(f"Unknown output profile '{profile}' (expected one of {OUTPUT_PROFILES})")
+
+def _png_image_data(data: bytes):
+    """(width, height, colors, deflate stream) of a plain 8-bit gray or RGB PNG, else None."""
+    if not data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return None
+    header, idat = None, []
+    pos = 8
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        if chunk_type == b"IHDR":
+            width, height, depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", body)
+            if depth != 8 or color_type not in (0, 2) or interlace:
+                return None  # palette, alpha, 16 bit or interlaced: let PyMuPDF convert it
+            header = (width, height, 1 if color_type == 0 else 3)
+        elif chunk_type == b"IDAT":
+            idat.append(body)
+        elif chunk_type == b"IEND":
+            break
+        pos += 12 + length
+    return (*header, b"".join(idat)) if header and idat else None
+
+def _new_image_xref(doc, width: int, height: int, colorspace: str, bits: int, extra: str = "") -> int:
+    xref = doc.get_new_xref()
+    doc.update_object(xref, f"<</Type/XObject/Subtype/Image/Width {width}/Height {height}"
+                            f"/ColorSpace/{colorspace}/BitsPerComponent {bits}{extra}>>")
+    return xref
+
+def insert_flat_image(page, rect, data: bytes) -> bool:
+    """
+    Places an encode_output_image result on `page` without decoding it where possible:
+    PNG data goes in as the image stream (PDF Flate with PNG predictors reads it as is), JPEG
+    stays DCT. Returns True when PyMuPDF had to decode the image instead (raw samples that
+    are compressed again when the document is saved).
+    """
+    doc = page.parent
+    png = _png_image_data(data)
+    if png is not None:
+        width, height, colors, stream = png
+        xref = _new_image_xref(doc, width, height, "DeviceGray" if colors == 1 else "DeviceRGB", 8)
+        doc.update_stream(xref, stream, compress=False)
+        # update_stream drops the filter keys of an uncompressed write: set them afterwards
+        doc.xref_set_key(xref, "Filter", "/FlateDecode")
+        doc.xref_set_key(xref, "DecodeParms", f"<</Predictor 15/Colors {colors}/BitsPerComponent 8/Columns {width}>>")
+        page.insert_image(rect, xref=xref)
+        return False
+    if data.startswith(b"P4\n"):
+        # insert_image would expand a PBM to 8 bits per pixel: write the 1-bit image object ourselves
+        header_end = data.index(b"\n", 3) + 1
+        width, height = (int(v) for v in data[3:header_end].split())
+        # PBM uses 1 for black where DeviceGray uses 0: hence the inverted Decode
+        xref = _new_image_xref(doc, width, height, "DeviceGray", 1, "/Decode[1 0]")
+        doc.update_stream(xref, data[header_end:], compress=True)
+        page.insert_image(rect, xref=xref)
+        return False
+    page.insert_image(rect, stream=data)
+    return not data.startswith(b"\xff\xd8")  # JPEG is embedded as it is
+
+# A page's text layer is trusted for inspection only if it has at least this many characters
+# and no embedded image covers more than this share of the page (about 22x22 pt on A4/Letter):
+# text inside an image (a scanned label, a signature) is only found by image inspection
+MIN_TEXT_LAYER_CHARS = 20
+MAX_TEXT_LAYER_IMAGE_AREA = 0.001
+
+def write_translation_outputs(results: List[tuple], output_folder: str, filename: str, target_lang: str) -> str:
+    """
+    Saves the (label, bytes) list returned by translate_document next to the anonymized output.
+    Single-chunk documents become processed/translated_<lang>_<file>; larger ones get a
+    <lang>_anonymized_<name>/ subfolder with one <label>_translated_<lang>_<file> per chunk.
+    Returns a log message describing what was written.
+    """
+    if len(results) == 1 and results[0][0] == "":
+        # Case A: Small document - Save normally in /processed
+        _, trans_bytes = results[0]
+        trans_output_path = os.path.join(output_folder, f"translated_{target_lang}_{filename}")
+        with open(trans_output_path, 'wb') as f:
+            f.write(trans_bytes)
+        return f"Translated copy saved: {os.path.basename(trans_output_path)}"
+
+    # Case B: Large document - Save in a dedicated subfolder
+    folder_base = os.path.splitext(filename)[0]
+    subfolder_name = f"{target_lang}_anonymized_{folder_base}"
+    subfolder_path = os.path.join(output_folder, subfolder_name)
+    os.makedirs(subfolder_path, exist_ok=True)
+    
+    for label, trans_bytes in results:
+        # Naming convention: 00-20_translated_en_filename.pdf
+        chunk_filename = f"{label}_translated_{target_lang}_{filename}"
+        with open(os.path.join(subfolder_path, chunk_filename), 'wb') as f:
+            f.write(trans_bytes)
+    return f"Large document split into {len(results)} translated chunks in: {subfolder_name}"
+
 class ClinicalDocumentProcessor:
-    def __init__(self, project_id: str, location: str = "global", credentials_file: str = None, log_callback=None):
+    def __init__(self, project_id: str, location: str = "global", credentials_file: str = None, log_callback=None,
+                 page_concurrency: int = 1, inspection_mode: str = "image", burn_into_raster: bool = False,
+                 upload_encoding: str = "png", jpeg_quality: int = 85,
+                 adaptive_zoom: bool = False, low_zoom: float = 2.0, dlp_batch_pages: int = 1,
+                 cache: PageResultCache = None, checkpoint_store: PageResultCache = None,
+                 api_limits: dict = None, vision_batch_pages: int = 1, translation_concurrency: int = 4,
+                 translation_mode: str = "document", stream_window_pages: int = 0, stream_memory_mb: float = 1024,
+                 output_profile: str = "png", output_jpeg_quality: int = 75, fast_save: bool = False):
         self.project_id = project_id
         self.location = location
         self.log_callback = log_callback
+        # Number of pages whose DLP/Vision calls may be in flight at once (1 = strictly sequential)
+        self.page_concurrency = max(1, int(page_concurrency or 1))
+        # "image": DLP inspects every rendered page.
+        # "text_layer": pages with a usable text layer are inspected as text; scans fall back to "image".
+        # "single_ocr": one Vision OCR pass on the original render feeds both DLP text inspection and the overlay.
+        if inspection_mode not in INSPECTION_MODES:
+            raise ValueError(f"Unknown inspection_mode '{inspection_mode}' (expected one of {INSPECTION_MODES})")
+        self.inspection_mode = inspection_mode
+        # Paint the redaction boxes straight into the stage-1 raster instead of
+        # apply_redactions() + a second rasterization of the page
+        self.burn_into_raster = bool(burn_into_raster)
+        # Payload profile of the page images uploaded to DLP and Vision (see UPLOAD_ENCODINGS)
+        if upload_encoding not in UPLOAD_ENCODINGS:
+            raise ValueError(f"Unknown upload_encoding '{upload_encoding}' (expected one of {tuple(UPLOAD_ENCODINGS)})")
+        self.upload_encoding = upload_encoding
+        self.jpeg_quality = int(jpeg_quality)
+        # Coarse-to-fine rendering: pages start at low_zoom and escalate to the full zoom only when
+        # they have small text, findings or low OCR confidence
+        self.adaptive_zoom = bool(adaptive_zoom)
+        self.low_zoom = float(low_zoom)
+        # Pages whose text (text layer or OCR) may share one DLP inspect_content request
+        self.dlp_batch_pages = max(1, int(dlp_batch_pages or 1))
+        # Page images OCR'd by one Vision batch_annotate_images request
+        self.vision_batch_pages = max(1, min(VISION_MAX_BATCH_IMAGES, int(vision_batch_pages or 1)))
+        # Translation chunks in flight at once (they are still returned in page order)
+        self.translation_concurrency = max(1, int(translation_concurrency or 1))
+        if translation_mode not in TRANSLATION_MODES:
+            raise ValueError(f"Unknown translation mode '{translation_mode}' (expected one of {TRANSLATION_MODES})")
+        self.translation_mode = translation_mode
+        # Streaming (process_document_to_file): finished pages are flushed to disk every
+        # stream_window_pages pages, and pages in flight plus pages waiting for the flush stay
+        # within stream_memory_mb. 0 = off, the whole output is built in RAM
+        self.stream_window_pages = max(0, int(stream_window_pages or 0))
+        self.stream_memory_mb = float(stream_memory_mb)
+        # Encoding of the flattened page images in the output (see OUTPUT_PROFILES)
+        if output_profile not in OUTPUT_PROFILES:
+            raise ValueError(f"Unknown output_profile '{output_profile}' (expected one of {OUTPUT_PROFILES})")
+        self.output_profile = output_profile
+        self.output_jpeg_quality = int(output_jpeg_quality)
+        # Save without the full garbage collection pass (object dedup and compaction): the output
+        # is built from scratch, so there is nothing for it to find
+        self.fast_save = bool(fast_save)
+        # Optional store of DLP findings and OCR words keyed by page content (see page_cache.py)
+        self.cache = cache
+        # Optional store of finished output pages, so an interrupted document resumes where it stopped
+        self.checkpoint_store = checkpoint_store
+        # Rate limit, AIMD concurrency and retry/backoff per API, shared with the other processors
+        # of the process (see api_calls.py)
+        self.api = shared_callers(api_limits)
+        # Typed progress and telemetry (document start, pages, stage spans, API payload sizes) for
+        # the GUI, the batch runner and exporters; see processor_events.py
+        self.events = EventBus()
+        self._log_lock = threading.Lock()
         
         if credentials_file:
             os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_file
         
+        self._create_clients()
+
+    def _create_clients(self):
         self.dlp_client = dlp_v2.DlpServiceClient()
         self.vision_client = vision.ImageAnnotatorClient()
         self.translate_client = translate.TranslationServiceClient()
 
-    def log(self, message, metadata=None):
-        if self.log_callback:
-            if metadata:
-                self.log_callback(f"{message} [METADATA:{metadata}]")
-            else:
+    @classmethod
+    def from_config(cls, config: dict, log_callback=None):
+        """Builds a processor from the `google_cloud`, `processing` and `translation` sections of config.json."""
+        cloud_config = config.get('google_cloud', {})
+        processing_config = config.get('processing', {})
+        translation_config = config.get('translation', {})
+        return cls(
+            project_id=cloud_config.get('project_id'),
+            location=cloud_config.get('location'),
+            credentials_file=cloud_config.get('service_account_key_file'),
+            log_callback=log_callback,
+            page_concurrency=processing_config.get('page_concurrency', 1),
+            inspection_mode=processing_config.get('inspection_mode', "image"),
+            burn_into_raster=processing_config.get('burn_into_raster', False),
+            upload_encoding=processing_config.get('upload_encoding', "png"),
+            jpeg_quality=processing_config.get('jpeg_quality', 85),
+            adaptive_zoom=processing_config.get('adaptive_zoom', False),
+            low_zoom=processing_config.get('low_zoom', 2.0),
+            dlp_batch_pages=processing_config.get('dlp_batch_pages', 1),
+            cache=open_cache(processing_config),
+            checkpoint_store=open_cache(processing_config, prefix="checkpoint", default_mb=2048),
+            api_limits=processing_config.get('api_limits'),
+            vision_batch_pages=processing_config.get('vision_batch_pages', 1),
+            translation_concurrency=translation_config.get('parallel_chunks', 4),
+            translation_mode=translation_config.get('mode', "document"),
+            stream_window_pages=processing_config.get('stream_window_pages', 0),
+            stream_memory_mb=processing_config.get('stream_memory_mb', 1024),
+            output_profile=processing_config.get('output_profile', "png"),
+            output_jpeg_quality=processing_config.get('output_jpeg_quality', 75),
+            fast_save=processing_config.get('fast_save', False)
+        )
+
+    def log(self, message):
+        # Pipeline stages log from several threads; keep lines whole and in order
+        with self._log_lock:
+            if self.log_callback:
                 self.log_callback(message)
-        else:
-            print(message)
+            else:
+                print(message)
+
+    def _call_api(self, api: str, fn, request_bytes: int, **kwargs):
+        """self.api[api].call(fn, **kwargs), reported as an API_CALL event with the payload sizes."""
+        if not self.events.wants(API_CALL):
+            return self.api[api].call(fn, **kwargs)
+        t0 = time.time()
+        response = self.api[api].call(fn, **kwargs)
+        self.events.emit(API_CALL, api=api, method=fn.__name__, request_bytes=request_bytes,
+                         response_bytes=message_size(response), seconds=round(time.time() - t0, 4))
+        return response
+
+    def _on_pipeline_stage(self, stage: str, tasks: List[PageTask], busy_s: float, lock_wait_s: float):
+        self.events.emit(PAGE_STAGE, stage=stage, pages=[task.index+1 for task in tasks],
+                         seconds=round(busy_s, 4), lock_wait_s=round(lock_wait_s, 4))
 
     def process_document(self, filepath: str, custom_terms: List[str] = None) -> bytes:
         filename = os.path.basename(filepath)
         
+        inspect_config = self.build_inspect_config(custom_terms)
+
+        # Detect PDF
+        is_pdf = filepath.lower().endswith(".pdf")
+        
+        try:
+            if is_pdf:
+                return self._process_pdf(filepath, inspect_config)
+            else:
+                # Fallback for simple images
+                img_bytes = self._process_image(filepath, inspect_config)
+                return img_bytes
+
+        except Exception as e:
+            error_str = str(e)
+            self.log(f"Failed to redact {filename}: {error_str}")
+            raise e
+
+    def process_document_to_file(self, filepath: str, output_path: str, custom_terms: List[str] = None):
+        """
+        Like process_document, but writes the result to `output_path` instead of returning it.
+        With streaming on (stream_window_pages), PDF pages are flushed to `<output_path>.partial`
+        window by window and the file is renamed once complete, so the output never sits in RAM whole.
+        Only flattened, redacted pages are ever written.
+        """
+        if not (self.stream_window_pages and filepath.lower().endswith(".pdf")):
+            doc_bytes = self.process_document(filepath, custom_terms=custom_terms)
+            with open(output_path, 'wb') as f:
+                f.write(doc_bytes)
+            return
+        try:
+            self._process_pdf(filepath, self.build_inspect_config(custom_terms), output_path=output_path)
+        except Exception as e:
+            self.log(f"Failed to redact {os.path.basename(filepath)}: {str(e)}")
+            raise e
+
+    def build_inspect_config(self, custom_terms: List[str] = None) -> dict:
+        """DLP inspect config: the fixed InfoTypes plus an optional custom dictionary."""
         # InfoTypes Config
         info_types = [
             {"name": "PERSON_NAME"}, 
@@ -79,21 +427,7 @@ class ClinicalDocumentProcessor:
             })
             inspect_config["custom_info_types"] = custom_info_types
 
-        # Detect PDF
-        is_pdf = filepath.lower().endswith(".pdf")
-        
-        try:
-            if is_pdf:
-                return self._process_pdf(filepath, inspect_config)
-            else:
-                # Fallback for simple images
-                img_bytes = self._process_image(filepath, inspect_config)
-                return img_bytes
-
-        except Exception as e:
-            error_str = str(e)
-            self.log(f"Failed to redact {filename}: {error_str}")
-            raise e
+        return inspect_config
 
     def _process_image(self, filepath: str, inspect_config) -> bytes:
         with open(filepath, "rb") as f:
@@ -111,7 +445,8 @@ class ClinicalDocumentProcessor:
                 image_redactions.append({"info_type": cit["info_type"], "redaction_color": {"red": 0, "green": 0, "blue": 0}})
 
         byte_item = {"type_": dlp_v2.ByteContentItem.BytesType.IMAGE_PNG, "data": image_bytes}
-        response = self.dlp_client.redact_image(
+        response = self._call_api(
+            "dlp", self.dlp_client.redact_image, len(image_bytes),
             request={
                 "parent": parent,
                 "inspect_config": inspect_config,
@@ -121,185 +456,1023 @@ class ClinicalDocumentProcessor:
         )
         return response.redacted_image
 
-    def _process_pdf(self, filepath: str, inspect_config) -> bytes:
+    def _process_pdf(self, filepath: str, inspect_config, output_path: str = None) -> bytes:
         """
         1. Native Redaction on original PDF
         2. Flattening (Convert to Image) to permanently remove underlying text
         3. OCR Overlay for 100% selectability
+        With an `output_path` (streaming), finished pages are flushed to disk and nothing is returned.
         """
-        doc = fitz.open(filepath)
-        total_pages = len(doc)
-        output_doc = fitz.open() # create new empty PDF
+        with FITZ_LOCK:
+            doc = fitz.open(filepath)
+            total_pages = len(doc)
+            output_doc = fitz.open() # create new empty PDF
+            first_rect = doc.load_page(0).rect if total_pages else None # sizes the streaming memory budget
         
-        self.log(f"Processing PDF (Anonymizing + Flattening + Searchable OCR Overlay)...", metadata={"pages": total_pages})
+        self.log(f"Processing PDF (Anonymizing + Flattening + Searchable OCR Overlay)...")
+        self.events.emit(DOCUMENT_START, pages=total_pages)
         
-        parent = f"projects/{self.project_id}/locations/global"
         zoom = 3.0
-        mat = fitz.Matrix(zoom, zoom)
 
-        for i in range(total_pages):
-            page = doc.load_page(i)
-            self.log(f"Analyzing & Digitalizing Page {i+1}/{total_pages}...")
-            
+        use_text_layer = self.inspection_mode == "text_layer"
+        single_ocr = self.inspection_mode == "single_ocr"
+        adaptive = self.adaptive_zoom and self.low_zoom < zoom
+        text_pages = []
+        upload_stats = {"images": 0, "bytes": 0, "encode_s": 0.0}
+        raster_stats = {"pixels": 0, "baseline_pixels": 0}
+        dlp_stats = {"pages": 0, "requests": 0}
+        vision_stats = {"pages": 0, "requests": 0}
+        dpi_decisions = []
+        cache_before = self.cache.stats() if self.cache else None
+        api_before = {name: caller.stats() for name, caller in self.api.items()}
+        checkpoint = None
+        if self.checkpoint_store is not None:
+            # Pages are only reused by a run with the same file and the same output settings
+            checkpoint = PageCheckpoint.for_document(self.checkpoint_store, filepath, self._checkpoint_settings(inspect_config))
+        resumed_pages = []
+        failed_pages = []
+        save_stats = {"save_s": 0.0}
+        # Full-page image buffers created per stage (rasters, encoded payloads, decoded images)
+        copies = {"render": 0, "inspect": 0, "redact": 0, "assemble": 0}
+
+        # Streaming: the assembled pages wait in output_doc until a window is full, then are
+        # appended to the .partial file and dropped from RAM
+        partial_path = output_path + ".partial" if output_path else None
+        window = {"pages": 0, "bytes": 0, "flushes": 0}
+        budget = self.stream_memory_mb * 1024 * 1024
+        if partial_path and os.path.exists(partial_path):
+            os.remove(partial_path)  # left over by an interrupted run
+
+        def flush_window():
+            nonlocal output_doc
+            t0 = time.time()
+            output_doc.set_metadata({})
+            if window["flushes"] == 0:
+                output_doc.save(partial_path, **self._save_options())
+            else:
+                output_doc.save(partial_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, deflate=True)
+            save_stats["save_s"] += time.time() - t0
+            # Reopen from disk: the flushed page images are read back lazily, if ever
+            output_doc.close()
+            output_doc = fitz.open(partial_path)
+            fitz.TOOLS.store_shrink(100)
+            window.update(pages=0, bytes=0, flushes=window["flushes"] + 1)
+
+        def render_at(page, page_zoom, escalation=False, stage="render"):
+            pix = page.get_pixmap(matrix=fitz.Matrix(page_zoom, page_zoom))
+            copies[stage] += 1
+            raster_stats["pixels"] += pix.width * pix.height
+            if not escalation:
+                # What the same render would have cost at the fixed full zoom
+                raster_stats["baseline_pixels"] += pix.width * pix.height * (zoom / page_zoom) ** 2
+            return pix
+
+        def escalate(task, reason):
+            # Fine pass: re-render at the full zoom; the inspect stage then inspects again
+            with FITZ_LOCK:
+                pix = render_at(doc.load_page(task.index), zoom, escalation=True, stage="inspect")
+                task.pix = pix if self.burn_into_raster else None
+                task.img_bytes = self._encode_upload(pix, upload_stats)
+                copies["inspect"] += 1
+            task.zoom, task.zoom_reason = zoom, reason
+
+        def render(task):
+            # STAGE 1: Render to find coordinates (born-digital pages only need their words)
+            self.log(f"Analyzing & Digitalizing Page {task.index+1}/{total_pages}...")
+            saved = checkpoint.load(task.index) if checkpoint else None
+            if saved:
+                # Finished by an earlier run: straight to assembly
+                task.flat_image, info = saved
+                task.rect = fitz.Rect(info["rect"])
+                task.words = [tuple(w) for w in info["words"]]
+                task.redact_rects = []
+                task.done = True
+                resumed_pages.append(task.index)
+                return
+            page = doc.load_page(task.index)
+            task.rect = page.rect
+            task.text_words = None
+            task.pix = None
+            task.zoom, task.zoom_reason = zoom, "fixed"
+            words = self._page_words(page) if (use_text_layer or adaptive) else []
+            if adaptive:
+                # Small print goes straight to the full zoom; everything else starts coarse
+                if self._has_small_text(words):
+                    task.zoom, task.zoom_reason = zoom, "small text"
+                else:
+                    task.zoom, task.zoom_reason = self.low_zoom, "coarse"
+            if use_text_layer and self._has_usable_text_layer(page, words):
+                task.text_words = words
+                text_pages.append(task.index)
+                return
+            pix = render_at(page, task.zoom)
+            if self.burn_into_raster:
+                # Keep the raster: the redactions are painted into it in stage 2
+                task.pix = pix
+            task.img_bytes = self._encode_upload(pix, upload_stats)
+            copies["render"] += 1
+
+        def inspect_image(task):
+            findings = self._inspect_image(task.img_bytes, inspect_config)
+            dlp_stats["requests"] += 1
+            if adaptive and findings and task.zoom < zoom:
+                escalate(task, "findings")
+                findings = self._inspect_image(task.img_bytes, inspect_config)
+                dlp_stats["requests"] += 1
+            task.finding_count, task.redact_rects = len(findings), self._image_findings_to_rects(findings, task.zoom)
+            task.img_bytes = None
+
+        def inspect_ocr_escalation(task):
+            reason = "findings" if task.finding_count else \
+                     "low OCR confidence" if task.ocr_confidence < LOW_OCR_CONFIDENCE else None
+            if reason:
+                escalate(task, reason)
+                task.words = self._ocr_image(task.img_bytes, task.zoom)
+                task.finding_count, task.redact_rects = self._inspect_words(task.words, inspect_config, dlp_stats)
+                task.img_bytes = None
+
+        def inspect(tasks):
+            # Inspect via DLP. Pages inspected as text share requests (dlp_batch_pages); image pages go one by one
+            text_tasks = [t for t in tasks if single_ocr or t.text_words is not None]
+            for task in tasks:
+                dlp_stats["pages"] += 1
+                if task not in text_tasks:
+                    self._run_isolated(task, inspect_image)
+            pages_words = [t.words if single_ocr else t.text_words for t in text_tasks]
             try:
-                # STAGE 1: NATIVE REDACTION
-                # Render to find coordinates
-                pix = page.get_pixmap(matrix=mat)
-                img_bytes = pix.tobytes("png")
-                
-                # Inspect via DLP
-                item = {"byte_item": {"type_": dlp_v2.ByteContentItem.BytesType.IMAGE_PNG, "data": img_bytes}}
-                response = self.dlp_client.inspect_content(
-                    request={"parent": parent, "inspect_config": inspect_config, "item": item}
-                )
-                
-                findings = response.result.findings
-                if findings:
-                    self.log(f"       Found {len(findings)} sensitive items. Applying native redactions...")
-                    for finding in findings:
-                        for loc in finding.location.content_locations:
-                            image_loc = getattr(loc, "image_location", None)
-                            if image_loc and image_loc.bounding_boxes:
-                                for box in image_loc.bounding_boxes:
-                                    # Translate coordinates back to PDF points
-                                    rect = fitz.Rect(box.left / zoom, box.top / zoom, 
-                                                    (box.left + box.width) / zoom, (box.top + box.height) / zoom)
-                                    page.add_redact_annot(rect, fill=(0, 0, 0))
-                    page.apply_redactions()
-
-                # STAGE 2: FLATTENING & BURNING
-                # Render the *redacted* page (burns in all black boxes)
-                pix_redacted = page.get_pixmap(matrix=mat)
-                redacted_img_bytes = pix_redacted.tobytes("png")
-                
-                # Create a clean page in the output document
-                new_page = output_doc.new_page(width=page.rect.width, height=page.rect.height)
-                new_page.insert_image(page.rect, stream=redacted_img_bytes)
-
-                # STAGE 3: CLOUD OCR OVERLAY
-                # Vision OCR on the flat image
-                vision_image = vision.Image(content=redacted_img_bytes)
-                vision_response = self.vision_client.document_text_detection(image=vision_image)
-                
-                if vision_response.full_text_annotation:
-                    # Place a hidden text layer
-                    for page_v in vision_response.full_text_annotation.pages:
-                        for block in page_v.blocks:
-                            for paragraph in block.paragraphs:
-                                for word in paragraph.words:
-                                    word_text = "".join([l.text for l in word.symbols])
-                                    vertices = word.bounding_box.vertices
-                                    x0 = min(v.x for v in vertices) / zoom
-                                    y0 = min(v.y for v in vertices) / zoom
-                                    x1 = max(v.x for v in vertices) / zoom
-                                    y1 = max(v.y for v in vertices) / zoom
-                                    
-                                    # Insert hidden text
-                                    new_page.insert_text((x0, y1), word_text, fontsize=(y1-y0)*0.8, render_mode=3)
-                                    
+                results = self._inspect_word_batches(pages_words, inspect_config, dlp_stats)
             except Exception as e:
-                self.log(f"       Error on page {i+1}: {e}")
-                
-            self.log(f"Page {i+1} completed", metadata={"page_done": i+1})
+                for task in text_tasks:
+                    task.error, task.error_stage = e, "inspect"
+                return
+            for task, (count, rects) in zip(text_tasks, results):
+                task.finding_count, task.redact_rects = count, rects
+                if single_ocr and adaptive and task.zoom < zoom:
+                    self._run_isolated(task, inspect_ocr_escalation)
+
+        def redact(task):
+            # STAGE 2: NATIVE REDACTION + FLATTENING & BURNING
+            if self.burn_into_raster:
+                # Only the raster reaches the output, so filling its pixels removes the text for good
+                pix = task.pix or render_at(doc.load_page(task.index), task.zoom, stage="redact")
+                task.pix = None
+                self._burn_redactions(pix, task.redact_rects, task.finding_count, task.zoom)
+            else:
+                # Render the *redacted* page (burns in all black boxes)
+                page = doc.load_page(task.index)
+                self._apply_redactions(page, task.redact_rects, task.finding_count)
+                pix = render_at(page, task.zoom, stage="redact")
+            # Encoded once: the same PNG goes to Vision and, undecoded, into the output (insert_flat_image)
+            task.flat_image = self._encode_output(pix)
+            copies["redact"] += 1
+            if not single_ocr:
+                task.ocr_bytes = self._encode_upload(pix, upload_stats, png_bytes=self._flat_png(task.flat_image))
+                copies["redact"] += task.ocr_bytes is not task.flat_image
+
+        def ocr(tasks):
+            # STAGE 3: CLOUD OCR OVERLAY (Vision OCR on the flat image, vision_batch_pages images per request)
+            # In single_ocr mode: one pass on the original render; its words feed the DLP text inspection
+            images = [task.img_bytes if single_ocr else task.ocr_bytes for task in tasks]
+            for task, result in zip(tasks, self._ocr_pages(images, vision_stats)):
+                task.img_bytes = task.ocr_bytes = None
+                if isinstance(result, Exception):
+                    task.error, task.error_stage = result, "ocr"
+                    continue
+                words, task.ocr_confidence = result
+                task.words = self._scale_words(words, task.zoom)
+                if adaptive and not single_ocr and task.zoom < zoom and task.ocr_confidence < LOW_OCR_CONFIDENCE:
+                    self._run_isolated(task, ocr_escalation, "ocr")
+
+        def ocr_escalation(task):
+            # Poor OCR of a coarse page: redo it at the full zoom (inspection for image pages, the
+            # redaction boxes of text-layer pages are in PDF points already), then OCR again
+            if task.text_words is None:
+                escalate(task, "low OCR confidence")
+                inspect_image(task)
+            else:
+                task.zoom, task.zoom_reason = zoom, "low OCR confidence"
+            with FITZ_LOCK:
+                redact(task)
+            result = self._ocr_pages([task.ocr_bytes], vision_stats)[0]
+            task.ocr_bytes = None
+            if isinstance(result, Exception):
+                raise result
+            words, task.ocr_confidence = result
+            task.words = self._scale_words(words, task.zoom)
+
+        def assemble(task):
+            # A failed page (not inspected, or without its text layer) fails the whole document below;
+            # the pages that did finish are checkpointed so the next run only redoes the failures
+            if task.error is not None:
+                task.flat_image = None
+                failed_pages.append(task.index)
+                self.log(f"       Error on page {task.index+1} ({task.error_stage}): {task.error}")
+            else:
+                new_page = self._new_flat_page(output_doc, task.rect, task.flat_image, copies)
+                words = task.words
+                if single_ocr:
+                    # The OCR ran before redaction: drop every word touching a redacted area
+                    words = [w for w in words if not any(fitz.Rect(w[1:5]).intersects(r) for r in task.redact_rects)]
+                self._insert_ocr_words(new_page, words)
+                if checkpoint and not task.done:
+                    checkpoint.save(task.index, task.flat_image, {"rect": list(task.rect), "words": words})
+                if partial_path:
+                    window["pages"] += 1
+                    window["bytes"] += len(task.flat_image)
+                    # Half the budget for the pages waiting here, half for the pages in flight
+                    if window["pages"] >= self.stream_window_pages or window["bytes"] >= budget / 2:
+                        flush_window()
+                task.flat_image = None
+                if task.done:
+                    self.log("       Restored from checkpoint")
+                elif adaptive:
+                    dpi_decisions.append({"page": task.index+1, "zoom": task.zoom, "reason": task.zoom_reason})
+                    self.log(f"       Resolution: {task.zoom}x ({task.zoom_reason})")
+            self.log(f"Page {task.index+1} completed")
+            self.events.emit(PAGE_DONE, page=task.index+1, restored=task.done, error=str(task.error) if task.error else None)
+
+        workers = self.page_concurrency
+        stages = {
+            "render": Stage("render", render, uses_fitz=True),
+            "inspect": Stage("inspect", inspect, workers=workers, batch_size=self.dlp_batch_pages),
+            "redact": Stage("redact", redact, uses_fitz=True),
+            "ocr": Stage("ocr", ocr, workers=workers, batch_size=self.vision_batch_pages),
+            "assemble": Stage("assemble", assemble, uses_fitz=True, ordered=True, always_run=True),
+        }
+        order = ["render", "ocr", "inspect", "redact", "assemble"] if single_ocr else \
+                ["render", "inspect", "redact", "ocr", "assemble"]
+        # Leave room for full DLP and Vision batches on top of the pages the other stages hold
+        max_in_flight = 2 * workers + (self.dlp_batch_pages - 1) + (self.vision_batch_pages - 1)
+        if partial_path and total_pages:
+            # A page in flight holds its full-zoom raster plus encoded copies (~1.5x the raster)
+            page_cost = 1.5 * 3 * first_rect.width * first_rect.height * zoom * zoom
+            slots = int(budget / 2 // page_cost)
+            if slots < 1:
+                self.log(f"       Streaming: a {zoom}x page needs ~{round(page_cost / (1024 * 1024))} MB, "
+                         f"more than half of stream_memory_mb; processing one page at a time")
+            max_in_flight = max(1, min(max_in_flight, slots))
+            self.log(f"       Streaming: windows of {self.stream_window_pages} pages, at most {max_in_flight} pages in flight "
+                     f"(budget {round(self.stream_memory_mb)} MB)")
+        pipeline = PagePipeline([stages[name] for name in order], max_in_flight=max_in_flight, lock=FITZ_LOCK,
+                                on_stage=self._on_pipeline_stage if self.events.wants(PAGE_STAGE) else None)
+
+        tasks = (PageTask(i, i) for i in range(total_pages))
+        if workers > 1:
+            pipeline.run(tasks)
+        else:
+            pipeline.run_inline(tasks)
+        self._log_pipeline_report(pipeline)
+        self._log_api_stats(api_before)
+        if resumed_pages:
+            self.log(f"       Checkpoint: resumed {len(resumed_pages)} of {total_pages} pages from a previous run")
+            self.events.emit(REPORT, resumed_pages=len(resumed_pages))
+        if upload_stats["images"]:
+            n = upload_stats["images"]
+            upload_stats["bytes_per_image"] = round(upload_stats["bytes"] / n)
+            upload_stats["encode_ms_per_image"] = round(upload_stats["encode_s"] * 1000 / n, 1)
+            self.log(f"       Upload encoding {self.upload_encoding}: {n} images, "
+                     f"{round(upload_stats['bytes_per_image'] / 1024)} KB and {upload_stats['encode_ms_per_image']} ms encode per image")
+            self.events.emit(REPORT, upload_stats=upload_stats)
+        if dlp_stats["requests"]:
+            self.log(f"       DLP inspection: {dlp_stats['pages']} pages in {dlp_stats['requests']} requests")
+            self.events.emit(REPORT, dlp_stats=dlp_stats)
+        if vision_stats["requests"] and self.vision_batch_pages > 1:
+            self.log(f"       Vision OCR: {vision_stats['pages']} pages in {vision_stats['requests']} requests")
+            self.events.emit(REPORT, vision_stats=vision_stats)
+        if adaptive:
+            fine = sum(1 for d in dpi_decisions if d["zoom"] == zoom)
+            ratio = raster_stats["pixels"] / raster_stats["baseline_pixels"] if raster_stats["baseline_pixels"] else 1
+            self.log(f"       Adaptive resolution: {len(dpi_decisions) - fine} pages at {self.low_zoom}x, {fine} at {zoom}x; "
+                     f"rendered {round(raster_stats['pixels'] / 1e6)} MP vs {round(raster_stats['baseline_pixels'] / 1e6)} MP "
+                     f"at a fixed {zoom}x ({round(ratio * 100)}%), uploaded {round(upload_stats['bytes'] / (1024 * 1024), 1)} MB")
+            self.events.emit(REPORT, dpi_decisions=dpi_decisions, raster_stats=raster_stats)
+        self._log_cache_stats(cache_before)
+        if total_pages:
+            self.log("       Image buffers: " + ", ".join(f"{stage} {round(n / total_pages, 1)}/page" for stage, n in copies.items()))
+            self.events.emit(REPORT, image_copies=copies)
+        if use_text_layer:
+            self.log(f"       Text-layer inspection: {len(text_pages)} pages, image inspection: {total_pages - len(text_pages)} pages")
+            self.events.emit(REPORT, text_layer_pages=len(text_pages))
+
+        if failed_pages:
+            self._discard_output(doc, output_doc, partial_path)
+            raise self._failed_pages_error(failed_pages, total_pages, checkpoint)
 
         # Save
-        self.log("Compiling document...", metadata={"save_start": 0})
-        
-        output_doc.set_metadata({})
+        self.log("Compiling document...")
+        save_t0 = self.events.start("save")
         
-        out_stream = io.BytesIO()
-        output_doc.save(out_stream, garbage=4, deflate=True)
-        doc_bytes = out_stream.getvalue()
-        
-        doc.close()
-        output_doc.close()
+        doc_bytes = None
+        with FITZ_LOCK:
+            if partial_path:
+                try:
+                    if window["pages"] or not window["flushes"]:
+                        flush_window()
+                    output_doc.close()
+                    os.replace(partial_path, output_path)
+                except Exception:
+                    output_doc.close()
+                    if os.path.exists(partial_path):
+                        os.remove(partial_path)
+                    raise
+                finally:
+                    doc.close()
+                self._log_peak_memory()
+            else:
+                output_doc.set_metadata({})
+                
+                t0 = time.time()
+                out_stream = io.BytesIO()
+                output_doc.save(out_stream, **self._save_options())
+                doc_bytes = out_stream.getvalue()
+                save_stats["save_s"] += time.time() - t0
+                
+                doc.close()
+                output_doc.close()
+        self._log_output_stats(len(doc_bytes) if doc_bytes is not None else os.path.getsize(output_path),
+                               total_pages, save_stats["save_s"])
+
+        if checkpoint:
+            # Complete: the next run of this file starts from scratch
+            checkpoint.discard(total_pages)
         
-        self.log("Success! Redacted searchable PDF generated. (Flattened)", metadata={"save_done": True})
+        self.log("Success! Redacted searchable PDF generated. (Flattened)")
+        self.events.end("save", save_t0)
         return doc_bytes
 
+    def _discard_output(self, doc, output_doc, partial_path: str = None):
+        """Closes an unfinished document and drops its output (and the streamed .partial file, if any)."""
+        with FITZ_LOCK:
+            doc.close()
+            output_doc.close()
+        if partial_path and os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    def _failed_pages_error(self, failed_pages: List[int], total_pages: int, checkpoint) -> RuntimeError:
+        """
+        The error for a document with failed pages. An anonymizer never hands out such a document:
+        no output is written, so the document stays pending and its next run redoes the failures.
+        """
+        pages = ", ".join(str(i + 1) for i in sorted(failed_pages))
+        kept = " The finished pages are kept as checkpoints for the next run." if checkpoint else ""
+        return RuntimeError(f"{len(failed_pages)} of {total_pages} pages failed (pages {pages}); no output was written.{kept}")
+
+    def _checkpoint_settings(self, inspect_config) -> list:
+        """Settings that shape the output pages: checkpoints are only reused when all of them match."""
+        return [inspect_config, self.inspection_mode, self.burn_into_raster, self.upload_encoding,
+                self.jpeg_quality, self.adaptive_zoom, self.low_zoom, self.output_profile, self.output_jpeg_quality]
+
+    def _encode_output(self, pix) -> bytes:
+        return encode_output_image(pix, self.output_profile, self.output_jpeg_quality)
+
+    def _flat_png(self, flat_image: bytes) -> bytes:
+        """The flat image when it is a colour PNG (reusable as upload payload), else None."""
+        return flat_image if self.output_profile == "png" else None
+
+    def _save_options(self) -> dict:
+        return {"garbage": 1 if self.fast_save else 4, "deflate": True}
+
+    def _log_output_stats(self, size: int, pages: int, save_s: float):
+        stats = {"profile": self.output_profile, "fast_save": self.fast_save, "bytes": size, "save_s": round(save_s, 3),
+                 "kb_per_page": round(size / 1024 / pages, 1) if pages else 0}
+        self.log(f"       Output {self.output_profile}: {stats['kb_per_page']} KB/page, saved in {stats['save_s']} s"
+                 f"{' (fast save)' if self.fast_save else ''}")
+        self.events.emit(REPORT, output_stats=stats)
+
+    def _log_peak_memory(self):
+        """Logs the peak resident memory of the process so far (where the OS reports it)."""
+        try:
+            import resource
+        except ImportError:
+            return  # Windows
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+        self.log(f"       Peak process memory so far: {round(peak_mb)} MB (stream budget {round(self.stream_memory_mb)} MB)")
+        self.events.emit(REPORT, peak_memory_mb=round(peak_mb))
+
+    def _log_pipeline_report(self, pipeline):
+        """Logs throughput and queue depth per stage so the bottleneck is visible."""
+        report = pipeline.report()
+        for name, stats in report.items():
+            self.log(f"       Stage {name}: {stats['processed']} pages, {stats['pages_per_s']} pg/s, "
+                     f"busy {round(stats['utilization'] * 100)}% of {stats['workers']} worker(s), "
+                     f"queue avg {stats['avg_queue_depth']} / max {stats['max_queue_depth']}")
+        self.log(f"       Pipeline bottleneck: {pipeline.bottleneck()}")
+        self.events.emit(REPORT, stage_stats=report)
+
+    def _log_cache_stats(self, before: dict):
+        """Logs this document's cache hits and misses (no-op without a cache)."""
+        if not self.cache:
+            return
+        after = self.cache.stats()
+        hits = after["hits"] - before["hits"]
+        misses = after["misses"] - before["misses"]
+        saved = round(after["saved_s"] - before["saved_s"], 1)
+        self.log(f"       Result cache: {hits} hits, {misses} misses, ~{saved}s of API time saved "
+                 f"({after['entries']} entries, {after['size_mb']} MB)")
+        self.events.emit(REPORT, cache_stats=dict(after, doc_hits=hits, doc_misses=misses, doc_saved_s=saved))
+
+    def _log_api_stats(self, before: dict):
+        """Logs this document's share of the API calls, retries and quota waits."""
+        usage = {}
+        for name, caller in self.api.items():
+            after = caller.stats()
+            delta = {k: round(after[k] - before[name][k], 2) for k in after if k != "concurrency_limit"}
+            if delta["calls"]:
+                usage[name] = dict(delta, concurrency_limit=after["concurrency_limit"], latency=caller.latency_report())
+        if usage:
+            summary = "; ".join(f"{name} {u['calls']} calls, {u['retries']} retries, {u['throttled']} throttled, "
+                                f"{u['hedges']} hedged ({u['hedge_wins']} won), {u['quota_wait_s']}s quota wait, "
+                                f"limit {u['concurrency_limit']}, p50/p95 {u['latency']['p50_s']}/{u['latency']['p95_s']}s"
+                                for name, u in usage.items())
+            self.log(f"       API usage: {summary}")
+            self.events.emit(REPORT, api_stats=usage)
+
+    def _encode_upload(self, pix, stats: dict = None, png_bytes: bytes = None) -> bytes:
+        """Encodes a page raster with the upload profile. `png_bytes` is reused when the profile is png."""
+        t0 = time.time()
+        if png_bytes is not None and self.upload_encoding == "png":
+            data = png_bytes
+        else:
+            data = encode_image(pix, self.upload_encoding, self.jpeg_quality)
+        if stats is not None:
+            stats["images"] += 1
+            stats["bytes"] += len(data)
+            stats["encode_s"] += time.time() - t0
+        return data
+
+    def _inspect_image(self, img_bytes: bytes, inspect_config, encoding: str = None):
+        """Runs DLP image inspection and returns the findings."""
+        parent = f"projects/{self.project_id}/locations/global"
+        bytes_type = UPLOAD_ENCODINGS[encoding or self.upload_encoding]
+        item = {"byte_item": {"type_": bytes_type, "data": img_bytes}}
+        def call():
+            return self._call_api(
+                "dlp", self.dlp_client.inspect_content, len(img_bytes),
+                request={"parent": parent, "inspect_config": inspect_config, "item": item}
+            ).result
+        result = self._cached("dlp_image", (int(bytes_type), img_bytes, fingerprint(inspect_config)), call,
+                              dlp_v2.InspectResult.serialize, dlp_v2.InspectResult.deserialize)
+        if result.findings_truncated:
+            self.log("       Warning: DLP truncated the findings of this page image; some items may be left unredacted")
+        return result.findings
+
+    def _cached(self, kind: str, parts: tuple, call, dumps, loads):
+        """Returns call() through the result cache (if any). dumps/loads convert the result to and from bytes."""
+        if self.cache is None:
+            return call()
+        key = self.cache.make_key(kind, *parts)
+        data = self.cache.get(key)
+        if data is not None:
+            return loads(data)
+        t0 = time.time()
+        result = call()
+        self.cache.put(key, dumps(result), cost_s=time.time() - t0)
+        return result
+
+    def _image_findings_to_rects(self, findings, zoom: float) -> List[fitz.Rect]:
+        """Translates the bounding boxes of DLP image findings back to PDF points."""
+        rects = []
+        for finding in findings:
+            for loc in finding.location.content_locations:
+                image_loc = getattr(loc, "image_location", None)
+                if image_loc and image_loc.bounding_boxes:
+                    for box in image_loc.bounding_boxes:
+                        rects.append(fitz.Rect(box.left / zoom, box.top / zoom, 
+                                               (box.left + box.width) / zoom, (box.top + box.height) / zoom))
+        return rects
+
+    def _apply_redactions(self, page, rects: List[fitz.Rect], finding_count: int):
+        """Applies native redactions over `rects` on the source page."""
+        if not finding_count:
+            return
+        self.log(f"       Found {finding_count} sensitive items. Applying native redactions...")
+        for rect in rects:
+            page.add_redact_annot(rect, fill=(0, 0, 0))
+        page.apply_redactions()
+
+    def _burn_redactions(self, pix, rects: List[fitz.Rect], finding_count: int, zoom: float):
+        """Fills `rects` (PDF points) with black directly in the page raster."""
+        if not finding_count:
+            return
+        self.log(f"       Found {finding_count} sensitive items. Burning redactions into the page image...")
+        black = (0,) * pix.n
+        for rect in rects:
+            # Grow to whole pixels plus a 1px margin so no anti-aliased glyph edge survives
+            area = (rect * fitz.Matrix(zoom, zoom)).irect
+            area = fitz.IRect(area.x0 - 1, area.y0 - 1, area.x1 + 1, area.y1 + 1) & pix.irect
+            if not area.is_empty:
+                pix.set_rect(area, black)
+
+    def _page_words(self, page) -> List[tuple]:
+        """Words of the page's text layer as (text, x0, y0, x1, y1) in PDF points, in reading order."""
+        return [(w[4], w[0], w[1], w[2], w[3]) for w in page.get_text("words", sort=True)]
+
+    def _has_usable_text_layer(self, page, words: List[tuple]) -> bool:
+        """
+        True for born-digital pages without images. Pages with little text or with any embedded
+        image beyond an icon (scans, photos, pasted labels and signatures) must be inspected as
+        images, since every image is burned into the flattened output.
+        """
+        if sum(len(w[0]) for w in words) < MIN_TEXT_LAYER_CHARS:
+            return False
+        max_image_area = MAX_TEXT_LAYER_IMAGE_AREA * (abs(page.rect) or 1)
+        return all(abs(fitz.Rect(info["bbox"]) & page.rect) <= max_image_area for info in page.get_image_info())
+
+    def _has_small_text(self, words: List[tuple]) -> bool:
+        """True when the median word height of a text layer is below SMALL_TEXT_HEIGHT points."""
+        if not words:
+            return False
+        heights = sorted(w[4] - w[2] for w in words)
+        return heights[len(heights) // 2] < SMALL_TEXT_HEIGHT
+
+    def _words_to_text(self, words: List[tuple]):
+        """
+        Joins words into one string for DLP text inspection.
+        Returns (text, offsets) where offsets[i] is the (start, end) codepoint span of words[i].
+        Words on the same line are separated by a space, lines by a newline.
+        """
+        parts = []
+        offsets = []
+        pos = 0
+        prev = None
+        for text, x0, y0, x1, y1 in words:
+            if prev is not None:
+                # A new line starts when the word sits below the previous one or jumps back to the left
+                sep = "\n" if (y0 >= prev[4] or x0 < prev[1]) else " "
+                parts.append(sep)
+                pos += 1
+            offsets.append((pos, pos + len(text)))
+            parts.append(text)
+            pos += len(text)
+            prev = (text, x0, y0, x1, y1)
+        return "".join(parts), offsets
+
+    def _inspect_text(self, content: str, inspect_config):
+        """Runs DLP inspection on plain text and returns the InspectResult (findings, findings_truncated)."""
+        parent = f"projects/{self.project_id}/locations/global"
+        def call():
+            return self._call_api(
+                "dlp", self.dlp_client.inspect_content, len(content.encode("utf-8")),
+                request={"parent": parent, "inspect_config": inspect_config, "item": {"value": content}}
+            ).result
+        return self._cached("dlp_text", (content, fingerprint(inspect_config)), call,
+                            dlp_v2.InspectResult.serialize, dlp_v2.InspectResult.deserialize)
+
+    def _spans_to_rects(self, spans: List[tuple], offsets: List[tuple], words: List[tuple]) -> List[fitz.Rect]:
+        """Maps (start, end) codepoint spans of DLP text findings back to the boxes of the words they cover."""
+        rects = []
+        for span_start, span_end in spans:
+            for (start, end), word in zip(offsets, words):
+                if start < span_end and end > span_start:
+                    rects.append(fitz.Rect(word[1:5]))
+        return rects
+
+    def _inspect_words(self, words: List[tuple], inspect_config, stats: dict = None):
+        """DLP text inspection of a page's words. Returns (finding count, redaction rects)."""
+        return self._inspect_word_batches([words], inspect_config, stats)[0]
+
+    def _inspect_word_batches(self, pages_words: List[List[tuple]], inspect_config, stats: dict = None) -> List[tuple]:
+        """
+        DLP text inspection of several pages with as few requests as possible.
+        Pages are joined with PAGE_TEXT_SEPARATOR into requests of at most `dlp_batch_pages`
+        pages and DLP_MAX_TEXT_BYTES, and each finding is split back to the page(s) it covers.
+        DLP caps the findings per request: a truncated answer is asked again in two halves,
+        down to one page per request.
+        Returns one (finding count, redaction rects) pair per page.
+        """
+        results = [(0, []) for _ in pages_words]
+        batch = []  # (page position, text, word offsets)
+        batch_bytes = 0
+
+        def flush(batch):
+            content = PAGE_TEXT_SEPARATOR.join(text for _, text, _ in batch)
+            result = self._inspect_text(content, inspect_config)
+            if stats is not None:
+                stats["requests"] += 1
+            if result.findings_truncated:
+                if len(batch) > 1:
+                    half = len(batch) // 2
+                    self.log(f"       DLP truncated the findings of {len(batch)} pages: splitting the request "
+                             f"({half} + {len(batch) - half} pages)")
+                    flush(batch[:half])
+                    flush(batch[half:])
+                    return
+                self.log("       Warning: DLP truncated the findings of a single page; some items may be left unredacted")
+            page_start = 0
+            for pos, text, offsets in batch:
+                page_end = page_start + len(text)
+                spans = []
+                for finding in result.findings:
+                    span = finding.location.codepoint_range
+                    if span.start < page_end and span.end > page_start:
+                        spans.append((span.start - page_start, span.end - page_start))
+                results[pos] = (len(spans), self._spans_to_rects(spans, offsets, pages_words[pos]))
+                page_start = page_end + len(PAGE_TEXT_SEPARATOR)
+
+        for pos, words in enumerate(pages_words):
+            if not words:
+                continue
+            text, offsets = self._words_to_text(words)
+            size = len(text.encode("utf-8"))
+            if batch and (len(batch) >= self.dlp_batch_pages or batch_bytes + size > DLP_MAX_TEXT_BYTES):
+                flush(batch)
+                batch, batch_bytes = [], 0
+            batch.append((pos, text, offsets))
+            batch_bytes += size + len(PAGE_TEXT_SEPARATOR)
+        if batch:
+            flush(batch)
+        return results
+
+    def _run_isolated(self, task, fn, stage: str = "inspect"):
+        """Runs fn(task) inside a batched stage, so a failure only marks this page as failed."""
+        try:
+            fn(task)
+        except Exception as e:
+            task.error = e
+            task.error_stage = stage
+
+    def _new_flat_page(self, output_doc, rect, img_bytes: bytes, copies: dict = None):
+        """Creates a clean page in the output document holding only the flat image."""
+        new_page = output_doc.new_page(width=rect.width, height=rect.height)
+        if insert_flat_image(new_page, new_page.rect, img_bytes) and copies is not None:
+            copies["assemble"] += 1  # decoded by PyMuPDF
+        return new_page
+
+    def _ocr_image(self, img_bytes: bytes, zoom: float) -> List[tuple]:
+        """Vision OCR on a flat image. Returns (text, x0, y0, x1, y1) words in PDF points."""
+        words, _ = self._ocr_page(img_bytes)
+        return self._scale_words(words, zoom)
+
+    def _ocr_page(self, img_bytes: bytes) -> tuple:
+        """Vision OCR of an image: (words in image pixels, mean confidence). Goes through the result cache."""
+        def call():
+            response = self._ocr_response(img_bytes)
+            return self._ocr_words(response, 1.0), self._ocr_confidence(response)
+        return self._cached("vision_ocr", (img_bytes,), call, self._ocr_cache_dumps, self._ocr_cache_loads)
+
+    @staticmethod
+    def _ocr_cache_dumps(result: tuple) -> bytes:
+        return json.dumps(result).encode("utf-8")
+
+    @staticmethod
+    def _ocr_cache_loads(data: bytes) -> tuple:
+        return tuple(json.loads(data))
+
+    def _ocr_pages(self, images: List[bytes], stats: dict = None) -> list:
+        """
+        Vision OCR of several images: cached ones are reused, the others are sent with
+        batch_annotate_images, up to vision_batch_pages images and VISION_MAX_BATCH_BYTES per request.
+        Returns, per image, (words in image pixels, mean confidence) or the exception Vision reported for it.
+        """
+        results = [None] * len(images)
+        keys = [self.cache.make_key("vision_ocr", img) for img in images] if self.cache else None
+        pending = []
+        for i, img in enumerate(images):
+            data = self.cache.get(keys[i]) if self.cache else None
+            if data is not None:
+                results[i] = self._ocr_cache_loads(data)
+            else:
+                pending.append(i)
+
+        def send(pack):
+            t0 = time.time()
+            if len(pack) == 1:
+                responses = [self._ocr_response(images[pack[0]])]
+            else:
+                features = [{"type_": vision.Feature.Type.DOCUMENT_TEXT_DETECTION}]
+                responses = self._call_api(
+                    "vision", self.vision_client.batch_annotate_images, sum(len(images[i]) for i in pack),
+                    requests=[{"image": {"content": images[i]}, "features": features} for i in pack]
+                ).responses
+            cost = (time.time() - t0) / len(pack)
+            if stats is not None:
+                stats["requests"] += 1
+                stats["pages"] += len(pack)
+            for i, response in zip(pack, responses):
+                if response.error.code:
+                    results[i] = RuntimeError(f"Vision OCR error {response.error.code}: {response.error.message}")
+                    continue
+                results[i] = (self._ocr_words(response, 1.0), self._ocr_confidence(response))
+                if self.cache:
+                    self.cache.put(keys[i], self._ocr_cache_dumps(results[i]), cost_s=cost)
+
+        pack, pack_bytes = [], 0
+        for i in pending:
+            if pack and (len(pack) >= self.vision_batch_pages or pack_bytes + len(images[i]) > VISION_MAX_BATCH_BYTES):
+                send(pack)
+                pack, pack_bytes = [], 0
+            pack.append(i)
+            pack_bytes += len(images[i])
+        if pack:
+            send(pack)
+        return results
+
+    def _scale_words(self, words: List[tuple], zoom: float) -> List[tuple]:
+        """Converts (text, x0, y0, x1, y1) words from image pixels to PDF points."""
+        return [(text, x0 / zoom, y0 / zoom, x1 / zoom, y1 / zoom) for text, x0, y0, x1, y1 in words]
+
+    def _ocr_response(self, img_bytes: bytes):
+        vision_image = vision.Image(content=img_bytes)
+        return self._call_api("vision", self.vision_client.document_text_detection, len(img_bytes), image=vision_image)
+
+    def _ocr_confidence(self, vision_response) -> float:
+        """Mean page confidence of a Vision response (1.0 when there is no text)."""
+        pages = vision_response.full_text_annotation.pages if vision_response.full_text_annotation else []
+        return sum(p.confidence for p in pages) / len(pages) if pages else 1.0
+
+    def _ocr_words(self, vision_response, zoom: float) -> List[tuple]:
+        """Words of a Vision response as (text, x0, y0, x1, y1) in PDF points."""
+        # Walk the raw protobuf: proto-plus wraps every field access, ~20x slower on dense pages
+        annotation = type(vision_response).pb(vision_response).full_text_annotation
+        words = []
+        for page_v in annotation.pages:
+            for block in page_v.blocks:
+                for paragraph in block.paragraphs:
+                    for word in paragraph.words:
+                        vertices = word.bounding_box.vertices
+                        xs = [v.x for v in vertices]
+                        ys = [v.y for v in vertices]
+                        words.append(("".join([l.text for l in word.symbols]),
+                                      min(xs) / zoom, min(ys) / zoom, max(xs) / zoom, max(ys) / zoom))
+        return words
+
+    def _insert_ocr_words(self, new_page, words: List[tuple]):
+        """Places a hidden text layer over the flat image."""
+        write_text_layer(new_page, words)
+
     def translate_document(self, doc_bytes: bytes, target_language: str = "en") -> List[tuple]:
         """
         Translates a PDF document using Google Cloud Translation AI.
         Dynamically splits the document into chunks where each chunk is < 30MB 
         (to stay well within Google's 40MiB synchronous payload limit).
+        Chunks are submitted as soon as they are built, up to `translation_concurrency` at once;
+        a slot is taken before the next chunk is built, so at most that many chunks are in memory
+        (plus the first page of the following one, which did not fit).
+        In "text" translation mode only the OCR text is sent (see _translate_text_layer).
+        `doc_bytes` may also be the path of the PDF (streamed output).
         """
-        try:
-            doc = fitz.open("pdf", doc_bytes)
-            total_pages = len(doc)
-            results = []
-            
-            MAX_PAYLOAD_BYTES = 30 * 1024 * 1024  # 30MB extra-safe limit (API limit is 40MiB)
-            
-            self.log(f"Analyzing {total_pages} pages for dynamic chunking...")
-            
-            current_chunk_doc = fitz.open()
-            current_start_idx = 0
-            chunk_num = 1
-            
-            for i in range(total_pages):
-                self.log(f"Preparing Page {i+1}...", metadata={"trans_flatten_start": True})
-                # We flatten page-by-page to check size
-                page = doc.load_page(i)
-                zoom = 2.0  # High quality
-                mat = fitz.Matrix(zoom, zoom)
-                pix = page.get_pixmap(matrix=mat)
-                img_bytes = pix.tobytes("png")
-                
-                # Try adding to current chunk
-                temp_page = current_chunk_doc.new_page(width=page.rect.width, height=page.rect.height)
-                temp_page.insert_image(page.rect, stream=img_bytes)
-                self.log(f"Page {i+1} flattened.", metadata={"trans_flatten_done": True})
-                
-                # Check resulting size
-                current_size = len(current_chunk_doc.tobytes())
-                
-                if current_size > MAX_PAYLOAD_BYTES and i > current_start_idx:
-                    # Current page pushed us over the limit
-                    current_chunk_doc.delete_page(len(current_chunk_doc) - 1)
-                    
-                    # Finalize previous chunk
-                    chunk_label = f"{current_start_idx+1:02d}-{i:02d}"
-                    chunk_bytes = current_chunk_doc.tobytes()
-                    self.log(f"Sending Chunk {chunk_num} (Pages {chunk_label}, {round(len(chunk_bytes)/(1024*1024), 1)}MB) to API...")
-                    
-                    self.log(f"Translating...", metadata={"trans_api_start": len(chunk_bytes)})
+        if self.translation_mode == "text":
+            try:
+                return [("", self._translate_text_layer(doc_bytes, target_language))]
+            except Exception as e:
+                self.log(f"Text translation failed: {e}")
+                raise e
+
+        pool = ThreadPoolExecutor(max_workers=self.translation_concurrency, thread_name_prefix="translate")
+        slots = threading.Semaphore(self.translation_concurrency)
+
+        def translate_chunk(chunk_num, chunk_bytes):
+            try:
+                self.log(f"Translating...")
+                with self.events.span("translate_api", bytes=len(chunk_bytes)):
                     translated_bytes = self._call_translate_api(chunk_bytes, target_language)
-                    self.log(f"Chunk {chunk_num} completed.", metadata={"trans_api_done": True})
-                    
-                    results.append((chunk_label, translated_bytes))
-                    
-                    # Start new chunk with the current page
-                    current_chunk_doc.close()
-                    current_chunk_doc = fitz.open()
-                    current_start_idx = i
-                    chunk_num += 1
-                    
-                    self.log(f"Retrying Page {i+1} in new chunk...", metadata={"trans_flatten_start": True})
-                    new_temp_page = current_chunk_doc.new_page(width=page.rect.width, height=page.rect.height)
-                    new_temp_page.insert_image(page.rect, stream=img_bytes)
-                    self.log(f"Page {i+1} moved to new chunk.", metadata={"trans_flatten_done": True})
-            
-            # Send the final chunk
-            if len(current_chunk_doc) > 0:
-                chunk_label = f"{current_start_idx+1:02d}-{total_pages:02d}"
-                chunk_bytes = current_chunk_doc.tobytes()
-                # If it's the only chunk, we don't need the label
-                actual_label = "" if chunk_num == 1 else chunk_label
-                
-                self.log(f"Sending Final Chunk (Pages {chunk_label}, {round(len(chunk_bytes)/(1024*1024), 1)}MB) to API...")
-                self.log(f"Translating...", metadata={"trans_api_start": len(chunk_bytes)})
-                translated_bytes = self._call_translate_api(chunk_bytes, target_language)
-                self.log(f"Final chunk completed.", metadata={"trans_api_done": True})
-                
-                results.append((actual_label, translated_bytes))
+                self.log(f"Chunk {chunk_num} completed.")
+                return translated_bytes
+            finally:
+                slots.release()
 
-            current_chunk_doc.close()
-            doc.close()
+        chunks = self._translation_chunks(doc_bytes)
+        try:
+            submitted = []
+            while True:
+                # The slot comes first: advancing the generator builds (and holds) the next chunk
+                slots.acquire()
+                failed = next((future for _, future in submitted if future.done() and future.exception()), None)
+                if failed:
+                    raise failed.exception()  # no point building the rest
+                chunk = next(chunks, None)
+                if chunk is None:
+                    slots.release()
+                    break
+                start, end, chunk_bytes = chunk
+                chunk_num = len(submitted) + 1
+                chunk_label = f"{start+1:02d}-{end:02d}"
+                self.log(f"Sending Chunk {chunk_num} (Pages {chunk_label}, {round(len(chunk_bytes)/(1024*1024), 1)}MB) to API...")
+                submitted.append((chunk_label, pool.submit(translate_chunk, chunk_num, chunk_bytes)))
+
+            # Page-label order, whatever order the API answered in
+            results = [(chunk_label, future.result()) for chunk_label, future in submitted]
+
+            # If it's the only chunk, we don't need the label
+            if len(results) == 1:
+                results = [("", results[0][1])]
             return results
 
         except Exception as e:
             self.log(f"Dynamic translation failed: {e}")
             raise e
+        finally:
+            chunks.close()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _translation_chunks(self, doc_bytes: bytes):
+        """
+        Splits a PDF into image-only chunks for the translation API, yielding (first page, end page, bytes).
+        Pages of our own flattened output already are one full-page image: they are copied as they are
+        (no re-rendering, no re-encoding) and only their OCR text layer is stripped. Other pages are
+        rendered at 2x as before. Chunks are packed by each page's measured image size, so every
+        chunk is serialized once (linear time) instead of after every page.
+        """
+        with FITZ_LOCK:
+            doc = self._open_pdf(doc_bytes)
+        total_pages = len(doc)
+        self.log(f"Analyzing {total_pages} pages for dynamic chunking...")
+
+        chunk_doc, chunk_start, chunk_size = None, 0, 0
+        for i in range(total_pages):
+            self.log(f"Preparing Page {i+1}...")
+            full_chunk = None
+            with self.events.span("translate_prepare"), FITZ_LOCK:
+                page = doc.load_page(i)
+                image_xref = self._full_page_image(page)
+                if image_xref:
+                    size = len(doc.xref_stream_raw(image_xref)) + TRANSLATION_PAGE_OVERHEAD
+                    img_bytes = None
+                else:
+                    img_bytes = page.get_pixmap(matrix=fitz.Matrix(2.0, 2.0)).tobytes("png")
+                    size = len(img_bytes) + TRANSLATION_PAGE_OVERHEAD
+
+                if chunk_doc is not None and chunk_size + size > TRANSLATION_MAX_PAYLOAD_BYTES:
+                    # This page would push the chunk over the limit: close it and start a new one.
+                    # It is yielded once the lock is released: the consumer sends it (and may wait
+                    # for a free translation slot) while the other documents keep using PyMuPDF
+                    full_chunk = (chunk_doc, chunk_start)
+                    chunk_doc = None
+                if chunk_doc is None:
+                    chunk_doc, chunk_start, chunk_size = fitz.open(), i, 0
+
+                if img_bytes is None:
+                    chunk_doc.insert_pdf(doc, from_page=i, to_page=i)
+                    copy = chunk_doc[-1]
+                    # Drop the invisible OCR text so the translation API works from the image
+                    copy.add_redact_annot(copy.rect)
+                    copy.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE,
+                                          graphics=fitz.PDF_REDACT_LINE_ART_NONE, text=fitz.PDF_REDACT_TEXT_REMOVE)
+                else:
+                    temp_page = chunk_doc.new_page(width=page.rect.width, height=page.rect.height)
+                    # The PNG's deflate stream becomes the image stream: no decode, nothing to compress at save
+                    insert_flat_image(temp_page, page.rect, img_bytes)
+                chunk_size += size
+            self.log(f"Page {i+1} flattened.")
+            if full_chunk is not None:
+                yield from self._finish_translation_chunk(*full_chunk)
+
+        if chunk_doc is not None:
+            yield from self._finish_translation_chunk(chunk_doc, chunk_start)
+        with FITZ_LOCK:
+            doc.close()
+
+    def _finish_translation_chunk(self, chunk_doc, start: int):
+        """Serializes a chunk; one that still came out too large (estimate off) is split in two."""
+        with FITZ_LOCK:
+            chunk_bytes = chunk_doc.tobytes(garbage=1, deflate=True)
+            pages = len(chunk_doc)
+            halves = None
+            if len(chunk_bytes) > TRANSLATION_MAX_PAYLOAD_BYTES and pages > 1:
+                halves = []
+                for first, last in ((0, pages // 2 - 1), (pages // 2, pages - 1)):
+                    half = fitz.open()
+                    half.insert_pdf(chunk_doc, from_page=first, to_page=last)
+                    halves.append((half, start + first))
+            chunk_doc.close()
+        if halves is None:
+            yield start, start + pages, chunk_bytes
+        else:
+            for half, half_start in halves:
+                yield from self._finish_translation_chunk(half, half_start)
+
+    def _open_pdf(self, source):
+        """Opens PDF bytes, or a PDF file when `source` is a path (read lazily from disk)."""
+        return fitz.open(source) if isinstance(source, str) else fitz.open("pdf", source)
+
+    def _translate_text_layer(self, doc_bytes: bytes, target_language: str) -> bytes:
+        """
+        "text" translation mode: instead of uploading the page images, translates the words of the
+        searchable layer we wrote in _process_pdf (already redacted) with batched translate_text
+        requests, then rebuilds the PDF locally: every block of words is covered on the scan and
+        its translation written in the same box, as real (searchable) text.
+        """
+        self.log("Reading text layer...")
+        with self.events.span("translate_prepare"), FITZ_LOCK:
+            doc = self._open_pdf(doc_bytes)
+            pages_blocks = [self._text_blocks(self._page_words(page)) for page in doc]
+        self.log(f"{sum(len(blocks) for blocks in pages_blocks)} text blocks on {len(pages_blocks)} pages.")
+
+        texts = [text for blocks in pages_blocks for text, _, _ in blocks]
+        translated = self._translate_texts(texts, target_language) if texts else []
+
+        self.log("Rebuilding translated PDF...")
+        with self.events.span("translate_prepare"), FITZ_LOCK:
+            unicode_font = None
+            pos = 0
+            for page, blocks in zip(doc, pages_blocks):
+                if not blocks:
+                    continue
+                # Drop the invisible OCR text: the translation becomes the searchable layer
+                page.add_redact_annot(page.rect)
+                page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE,
+                                      graphics=fitz.PDF_REDACT_LINE_ART_NONE, text=fitz.PDF_REDACT_TEXT_REMOVE)
+                for (_, rect, line_height), text in zip(blocks, translated[pos:pos + len(blocks)]):
+                    fontname = "helv"
+                    if any(ord(c) > 255 for c in text):
+                        # Helvetica only covers Latin-1; the bundled fallback font has Cyrillic, Greek and CJK
+                        if unicode_font is None:
+                            unicode_font = fitz.Font("cjk")
+                        page.insert_font(fontname="unicode", fontbuffer=unicode_font.buffer)
+                        fontname = "unicode"
+                    self._insert_translated_block(page, rect, text, line_height, fontname)
+                pos += len(blocks)
+            if unicode_font is not None:
+                doc.subset_fonts()  # keep only the glyphs used
+            doc.set_metadata({})
+            translated_bytes = doc.tobytes(garbage=4, deflate=True)
+            doc.close()
+        self.log("Translated PDF rebuilt.")
+        return translated_bytes
+
+    def _text_blocks(self, words: List[tuple]) -> List[tuple]:
+        """
+        Groups words (reading order) into lines, and lines into blocks of running text, the unit
+        sent for translation. Returns (text, rect, line height) per block.
+        """
+        lines = []
+        prev = None
+        for text, x0, y0, x1, y1 in words:
+            # Same line rule as _words_to_text
+            if prev is None or y0 >= prev[4] or x0 < prev[1]:
+                lines.append([text, fitz.Rect(x0, y0, x1, y1)])
+            else:
+                lines[-1][0] += " " + text
+                lines[-1][1] |= fitz.Rect(x0, y0, x1, y1)
+            prev = (text, x0, y0, x1, y1)
+
+        blocks = []
+        for text, rect in lines:
+            if blocks:
+                block = blocks[-1]
+                height = block[2] / block[3]
+                # The next line of a block starts just below it and overlaps it horizontally
+                if -0.5 * height <= rect.y0 - block[1].y1 < 0.8 * height and rect.x0 < block[1].x1 and rect.x1 > block[1].x0:
+                    block[0] += " " + text
+                    block[1] |= rect
+                    block[2] += rect.height
+                    block[3] += 1
+                    continue
+            blocks.append([text, rect, rect.height, 1])
+        return [(text, rect, height / n) for text, rect, height, n in blocks]
+
+    def _translate_texts(self, texts: List[str], target_language: str) -> List[str]:
+        """Translates text segments with as few translate_text requests as the limits allow, in order."""
+        batches = []
+        size = 0
+        for text in texts:
+            if not batches or len(batches[-1]) >= TRANSLATION_MAX_TEXT_SEGMENTS or size + len(text) > TRANSLATION_MAX_TEXT_CODEPOINTS:
+                batches.append([])
+                size = 0
+            batches[-1].append(text)
+            size += len(text)
+
+        stats = {"segments": len(texts), "requests": len(batches), "bytes": sum(len(t.encode("utf-8")) for t in texts)}
+
+        def send(batch):
+            self.log("Translating...")
+            with self.events.span("translate_api", bytes=sum(len(t.encode("utf-8")) for t in batch)):
+                result = self._call_translate_text_api(batch, target_language)
+            self.log(f"{len(batch)} text blocks translated.")
+            return result
+
+        with ThreadPoolExecutor(max_workers=self.translation_concurrency, thread_name_prefix="translate") as pool:
+            translated = [text for result in pool.map(send, batches) for text in result]
+        self.log(f"       Text translation: {stats['segments']} blocks, {round(stats['bytes'] / 1024, 1)} KB "
+                 f"in {stats['requests']} requests")
+        self.events.emit(REPORT, text_translation_stats=stats)
+        return translated
+
+    def _insert_translated_block(self, page, rect, text: str, line_height: float, fontname: str):
+        """Covers a block of the scan and writes its translation at the largest size (up to the original) that fits."""
+        # The OCR boxes are tight: pad the cover a little so no stroke of the original shows
+        pad = line_height * 0.15
+        page.draw_rect(rect + (-pad, -pad, pad, pad), color=None, fill=(1, 1, 1))
+        fontsize = max(TRANSLATION_MIN_FONT_SIZE, line_height * 0.8)
+        while page.insert_textbox(rect, text, fontsize=fontsize, fontname=fontname) < 0:
+            if fontsize <= TRANSLATION_MIN_FONT_SIZE:
+                # Still too long at the smallest size: let it run down the page rather than lose it
+                rect = fitz.Rect(rect.x0, rect.y0, max(rect.x1, page.rect.x1 - rect.x0), page.rect.y1)
+                page.insert_textbox(rect, text, fontsize=fontsize, fontname=fontname)
+                return
+            fontsize = max(TRANSLATION_MIN_FONT_SIZE, fontsize * 0.85)
+
+    def _full_page_image(self, page) -> int:
+        """xref of the single image covering the whole page (our flattened output), else 0."""
+        images = page.get_images()
+        if len(images) != 1 or page.get_drawings():
+            return 0
+        # Without hashes/xrefs, get_image_info() only reads the placement (no image decoding)
+        placed = page.get_image_info()
+        if len(placed) == 1 and abs(fitz.Rect(placed[0]["bbox"]) & page.rect) >= 0.99 * abs(page.rect):
+            return images[0][0]
+        return 0
 
     def _call_translate_api(self, doc_bytes: bytes, target_language: str) -> bytes:
         """Internal helper to call the Google Translation API for a single PDF byte stream."""
@@ -313,7 +1486,8 @@ class ClinicalDocumentProcessor:
             "mime_type": "application/pdf",
         }
 
-        response = self.translate_client.translate_document(
+        response = self._call_api(
+            "translate", self.translate_client.translate_document, len(doc_bytes),
             request={
                 "parent": parent,
                 "target_language_code": target_language,
@@ -321,6 +1495,23 @@ class ClinicalDocumentProcessor:
             }
         )
 
+        return self._translated_bytes(response)
+
+    def _call_translate_text_api(self, texts: List[str], target_language: str) -> List[str]:
+        """One translate_text request; the translations come back in the order of `texts`."""
+        response = self._call_api(
+            "translate", self.translate_client.translate_text, sum(len(t.encode("utf-8")) for t in texts),
+            request={
+                "parent": f"projects/{self.project_id}/locations/us-central1",
+                "contents": texts,
+                "mime_type": "text/plain",
+                "target_language_code": target_language,
+            }
+        )
+        return [t.translated_text for t in response.translations]
+
+    def _translated_bytes(self, response) -> bytes:
+        """Extracts the translated PDF from a translate_document response."""
         doc_trans = response.document_translation
         if hasattr(doc_trans, "byte_content") and doc_trans.byte_content:
             return doc_trans.byte_content
@@ -350,8 +1541,8 @@ class ClinicalDocumentProcessor:
             
             # Create a new page with the same dimensions
             new_page = new_doc.new_page(width=page.rect.width, height=page.rect.height)
-            # Insert the image to cover the whole page
-            new_page.insert_image(page.rect, stream=img_bytes)
+            # Insert the image to cover the whole page (kept compressed, see insert_flat_image)
+            insert_flat_image(new_page, page.rect, img_bytes)
             
         # Ensure no metadata is carried over to the translation
         new_doc.set_metadata({})
@@ -360,3 +1551,178 @@ class ClinicalDocumentProcessor:
         doc.close()
         new_doc.close()
         return flattened_bytes
+
+
+# ---------------------------------------------------------------------------
+# Headless batch runner: python -m dlp_processor batch <folder>
+# ---------------------------------------------------------------------------
+
+# Per worker process state, set by _batch_init
+_batch_processor = None
+_batch_events = None
+_batch_telemetry = False
+
+def _batch_init(config: dict, events, telemetry: bool = False):
+    global _batch_processor, _batch_events, _batch_telemetry
+    _batch_events = events
+    _batch_telemetry = telemetry
+    _batch_processor = ClinicalDocumentProcessor.from_config(config)
+
+def _batch_emit(doc: str, event: str, **fields):
+    _batch_events.put({"time": round(time.time(), 3), "doc": doc, "event": event, **fields})
+
+def _batch_document(source_folder: str, filename: str, custom_terms: List[str], trans_config: dict) -> dict:
+    """Runs in a worker process: anonymizes (and optionally translates) one document."""
+    processor = _batch_processor
+    processor.log_callback = lambda message: _batch_emit(filename, "log", message=message)
+
+    def forward(event):
+        _batch_events.put(event.to_dict(doc=filename))
+    # Every processor event goes to the --jsonl file; without one only the page count is needed
+    processor.events.subscribe(forward, kinds=None if _batch_telemetry else [PAGE_DONE])
+
+    start = time.time()
+    output_folder = os.path.join(source_folder, "processed")
+    result = {"doc": filename, "success": False, "error": None}
+    try:
+        output_path = os.path.join(output_folder, f"anonymized_{filename}")
+        if processor.stream_window_pages:
+            # Streaming: the output goes straight to disk and translation reads it from there
+            processor.process_document_to_file(os.path.join(source_folder, filename), output_path, custom_terms=custom_terms)
+            redacted = output_path
+        else:
+            redacted = processor.process_document(os.path.join(source_folder, filename), custom_terms=custom_terms)
+            if not redacted:
+                raise ValueError("no content returned")
+            with open(output_path, 'wb') as f:
+                f.write(redacted)
+
+        if trans_config.get('enabled', False) and filename.lower().endswith('.pdf'):
+            try:
+                target_lang = trans_config.get('target_language_code', 'en')
+                results = processor.translate_document(redacted, target_language=target_lang)
+                processor.log(write_translation_outputs(results, output_folder, filename, target_lang))
+            except Exception as te:
+                processor.log(f"Translation error: {te}")
+        result["success"] = True
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        processor.events.unsubscribe(forward)
+    result["seconds"] = round(time.time() - start, 2)
+    return result
+
+def pending_documents(source_folder: str, force: bool = False) -> List[str]:
+    """Supported documents in `source_folder` without an anonymized output yet (same rule as the GUI)."""
+    output_folder = os.path.join(source_folder, "processed")
+    files = []
+    for f in sorted(os.listdir(source_folder)):
+        if f.startswith('.') or not f.lower().endswith(SUPPORTED_EXTENSIONS):
+            continue
+        if os.path.isdir(os.path.join(source_folder, f)):
+            continue
+        if not force and os.path.exists(os.path.join(output_folder, f"anonymized_{f}")):
+            continue
+        files.append(f)
+    return files
+
+def run_batch(source_folder: str, config: dict, workers: int, custom_terms: List[str] = None,
+              progress_file: str = None, force: bool = False, quiet: bool = False) -> int:
+    """
+    Processes every pending document of `source_folder` on a pool of worker processes.
+    Progress goes to stdout and, optionally, as one JSON object per line to `progress_file`.
+    Returns the number of failed documents.
+    """
+    files = pending_documents(source_folder, force)
+    # Largest documents first, so a big PDF doesn't end up alone at the tail of the batch
+    files.sort(key=lambda f: os.path.getsize(os.path.join(source_folder, f)), reverse=True)
+    os.makedirs(os.path.join(source_folder, "processed"), exist_ok=True)
+
+    events = multiprocessing.Queue()
+    jsonl = JsonlExporter(progress_file) if progress_file else None
+    counters = {"docs_done": 0, "pages_done": 0}
+
+    def report(event):
+        if event.get("event") == PAGE_DONE:
+            counters["pages_done"] += 1
+        elif event.get("event") == "doc_done":
+            event["pages_done"] = counters["pages_done"]
+        if jsonl:
+            jsonl.write(event)
+        # Processor events (pages, spans, API calls, reports) only go to the JSON lines file
+        if event.get("event") in EVENT_KINDS or (quiet and event.get("event") == "log"):
+            return
+        stamp = time.strftime('%H:%M:%S', time.localtime(event["time"]))
+        if event.get("event") == "log":
+            print(f"{stamp} [{event['doc']}] {event['message']}", flush=True)
+        else:
+            details = ", ".join(f"{k}={v}" for k, v in event.items() if k not in ("time", "doc", "event"))
+            print(f"{stamp} [{event['doc']}] {event['event']}: {details}", flush=True)
+
+    def reporter():
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            report(event)
+
+    reporter_thread = threading.Thread(target=reporter, daemon=True)
+    reporter_thread.start()
+
+    workers = max(1, min(workers, len(files) or 1))
+    # Every worker process has its own rate limiters: give each an equal share of the project quota
+    processing_config = config.get('processing', {})
+    config = dict(config, processing=dict(processing_config,
+                                          api_limits=split_api_limits(processing_config.get('api_limits'), workers)))
+    events.put({"time": time.time(), "doc": "*", "event": "batch_start", "documents": len(files), "workers": workers})
+    failed = 0
+    start = time.time()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_batch_init,
+                                 initargs=(config, events, bool(progress_file))) as pool:
+            futures = [pool.submit(_batch_document, source_folder, f, custom_terms or [], config.get('translation', {}))
+                       for f in files]
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"doc": "?", "success": False, "error": str(e)}
+                counters["docs_done"] += 1
+                failed += 0 if result["success"] else 1
+                events.put({"time": time.time(), "event": "doc_done", "progress": f"{counters['docs_done']}/{len(files)}", **result})
+    finally:
+        events.put({"time": time.time(), "doc": "*", "event": "batch_done", "documents": len(files),
+                    "failed": failed, "seconds": round(time.time() - start, 2)})
+        events.put(None)
+        reporter_thread.join()
+        if jsonl:
+            jsonl.close()
+    return failed
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m dlp_processor",
+                                     description="Headless anonymization of clinical documents (no Tkinter needed).")
+    commands = parser.add_subparsers(dest="command", required=True)
+    batch = commands.add_parser("batch", help="Anonymize every pending document of a folder into <folder>/processed")
+    batch.add_argument("folder")
+    batch.add_argument("--config", default="config.json", help="Path to config.json (default: ./config.json)")
+    batch.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                       help="Documents processed in parallel, one process each (default: CPU count)")
+    batch.add_argument("--page-concurrency", type=int, help="Overrides processing.page_concurrency")
+    batch.add_argument("--keyword", action="append", default=[], help="Extra term to redact (repeatable)")
+    batch.add_argument("--jsonl", help="Append progress events as JSON lines to this file")
+    batch.add_argument("--force", action="store_true", help="Also reprocess documents that already have an output")
+    batch.add_argument("--quiet", action="store_true", help="Only print document-level events")
+    args = parser.parse_args(argv)
+
+    with open(args.config, 'r') as f:
+        config = json.load(f)
+    if args.page_concurrency:
+        config.setdefault('processing', {})['page_concurrency'] = args.page_concurrency
+
+    failed = run_batch(args.folder, config, args.workers, custom_terms=args.keyword,
+                       progress_file=args.jsonl, force=args.force, quiet=args.quiet)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+import os
+import json
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Name of the environment variable holding the Fernet key of the encrypted on-disk cache
+CACHE_KEY_ENV = "ANONYMIZER_CACHE_KEY"
+CACHE_MODES = ("off", "memory", "encrypted")
+
+# Memory caches are shared by every processor of the process, so a rerun from the GUI
+# (new processors, same settings) still finds the results of the previous run
+_shared_caches = {}
+_shared_lock = threading.Lock()
+
+
+def fingerprint(obj) -> str:
+    """Stable hash of a JSON-like object (e.g. the DLP inspect config)."""
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class PageResultCache:
+    """
+    Content-addressed store for the results of the per-page API calls (DLP findings, Vision OCR words).
+    Keys are hashes of the uploaded content plus whatever else changes the answer (inspect config,
+    encoding), so a hit is always valid. Entries are evicted least-recently-used once the total
+    size exceeds `max_bytes`.
+    Without `directory` everything stays in RAM. With a `directory`, entries are written there
+    encrypted with Fernet (`cryptography` package) under `secret_key`, and survive restarts.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, directory: str = None, secret_key: bytes = None):
+        self.max_bytes = max(0, int(max_bytes))
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> value (memory) or size in bytes (disk)
+        self._sizes = {}
+        self._costs = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_s = 0.0
+
+        self._fernet = None
+        if directory:
+            try:
+                from cryptography.fernet import Fernet
+            except ImportError:
+                raise ImportError("The encrypted page cache needs the 'cryptography' package (pip install cryptography)")
+            if not secret_key:
+                raise ValueError(f"The encrypted page cache needs a Fernet key in the {CACHE_KEY_ENV} environment variable")
+            self._fernet = Fernet(secret_key)
+            os.makedirs(directory, exist_ok=True)
+            self._load_index()
+
+    @staticmethod
+    def make_key(kind: str, *parts) -> str:
+        """Cache key for a call of type `kind` on `parts` (bytes or str)."""
+        h = hashlib.sha256(kind.encode("utf-8"))
+        for part in parts:
+            h.update(b"\0")
+            h.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str):
+        """Returns the cached bytes for `key`, or None."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if self._fernet is None:
+                self.hits += 1
+                self.saved_s += self._costs.get(key, 0.0)
+                return self._entries[key]
+        try:
+            with open(self._path(key), "rb") as f:
+                data = self._fernet.decrypt(f.read())
+        except Exception:
+            # Missing, truncated or written under another key: treat as a miss
+            with self._lock:
+                self.misses += 1
+                self._drop(key)
+            return None
+        with self._lock:
+            self.hits += 1
+            self.saved_s += struct.unpack("<d", data[:8])[0]
+        return data[8:]
+
+    def put(self, key: str, value: bytes, cost_s: float = 0.0):
+        """Stores `value`. `cost_s` is the API time it took, counted as saved on every later hit."""
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        if self._fernet is not None:
+            tmp = self._path(key) + f".{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                # The API cost travels with the entry so a restarted app still reports saved time
+                f.write(self._fernet.encrypt(struct.pack("<d", cost_s) + value))
+            os.replace(tmp, self._path(key))
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._sizes[key]
+            self._entries[key] = value if self._fernet is None else size
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            if self._fernet is None:
+                self._costs[key] = cost_s
+            self.size += size
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "size_mb": round(self.size / (1024 * 1024), 2),
+                "evictions": self.evictions,
+                "saved_s": round(self.saved_s, 2),
+            }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _drop(self, key: str):
+        """Removes one entry (caller holds the lock)."""
+        self._entries.pop(key, None)
+        self.size -= self._sizes.pop(key, 0)
+        self._costs.pop(key, None)
+        if self._fernet is not None:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _load_index(self):
+        """Rebuilds the LRU order of an existing cache directory from the file times (oldest first)."""
+        files = []
+        for name in os.listdir(self.directory):
+            path = self._path(name)
+            if name.endswith(".tmp"):
+                os.remove(path)  # left over by an interrupted write
+                continue
+            st = os.stat(path)
+            files.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(files):
+            # The real payload is a bit smaller than the Fernet token; close enough for eviction
+            self._entries[name] = size
+            self._sizes[name] = size
+            self.size += size
+
+
+class PageCheckpoint:
+    """
+    Completed output pages of one document (flat image + OCR words), so a run that crashed or was
+    stopped resumes at the first unfinished page instead of starting over.
+    Entries live in a PageResultCache (RAM or encrypted on disk) under a key derived from the
+    source file contents and the settings that shape the output; `discard` drops them once the
+    document is saved.
+    """
+
+    def __init__(self, store: PageResultCache, doc_key: str):
+        self.store = store
+        self.doc_key = doc_key
+
+    @classmethod
+    def for_document(cls, store: PageResultCache, filepath: str, settings) -> "PageCheckpoint":
+        h = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+        return cls(store, store.make_key("document", h.hexdigest(), fingerprint(settings)))
+
+    def _key(self, index: int) -> str:
+        return self.store.make_key("page", self.doc_key, index)
+
+    def save(self, index: int, flat_image: bytes, info: dict):
+        """Stores a finished page. `info` is JSON-serializable (page size, words, ...)."""
+        header = json.dumps(info).encode("utf-8")
+        self.store.put(self._key(index), struct.pack("<I", len(header)) + header + flat_image)
+
+    def load(self, index: int):
+        """Returns (flat_image, info) for a finished page, or None."""
+        data = self.store.get(self._key(index))
+        if data is None:
+            return None
+        size = struct.unpack("<I", data[:4])[0]
+        return data[4 + size:], json.loads(data[4:4 + size])
+
+    def discard(self, pages: int):
+        self.store.delete([self._key(index) for index in range(pages)])
+
+
+def open_cache(processing_config: dict, prefix: str = "cache", default_mb: float = 256):
+    """
+    Page store described by the `processing` section of config.json, or None when disabled.
+    `<prefix>_mode`: "off" (default), "memory" or "encrypted" (`<prefix>_dir`, key from the
+    ANONYMIZER_CACHE_KEY environment variable); `<prefix>_max_mb` bounds its size.
+    Used for the result cache ("cache") and the page checkpoints ("checkpoint").
+    """
+    mode = processing_config.get(f"{prefix}_mode", "off") or "off"
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown {prefix}_mode '{mode}' (expected one of {CACHE_MODES})")
+    if mode == "off":
+        return None
+    max_bytes = int(float(processing_config.get(f"{prefix}_max_mb", default_mb)) * 1024 * 1024)
+    directory = os.path.abspath(processing_config.get(f"{prefix}_dir", f".page_{prefix}")) if mode == "encrypted" else None
+
+    with _shared_lock:
+        key = (prefix, mode, max_bytes, directory)
+        if key not in _shared_caches:
+            secret_key = os.environ.get(CACHE_KEY_ENV) if directory else None
+            _shared_caches[key] = PageResultCache(max_bytes=max_bytes, directory=directory, secret_key=secret_key)
+        return _shared_caches[key]
+
@@ -0,0 +1,246 @@
+import queue
+import threading
+import time
+from typing import Callable, Iterable, List
+
+# Sentinel that travels down the queues once the last page has been fed
+_DONE = object()
+
+
+class PageTask:
+    """Work item carried through the pipeline. Stages attach their results to it."""
+
+    def __init__(self, seq: int, index: int):
+        self.seq = seq          # position in the output document (0, 1, 2, ...)
+        self.index = index      # page number in the source document
+        self.error = None
+        self.error_stage = None
+        self.done = False       # result already known (e.g. restored): only `always_run` stages see it
+
+
+class Stage:
+    """
+    One step of the page pipeline.
+    `fn(task)` mutates the task in place. Stages flagged `uses_fitz` run under the
+    shared PyMuPDF lock (PyMuPDF is not thread-safe); all others run freely, which is
+    where the network-bound DLP and Vision calls live.
+    An `ordered` stage has a single worker and sees tasks strictly in `seq` order.
+    A stage with `always_run` also receives tasks that failed upstream or are already `done`.
+    A stage with a `batch_size` receives lists of up to that many tasks instead of single
+    tasks: a worker takes whatever is queued, waiting at most `batch_wait` seconds for more.
+    If `fn` raises, every task of the batch is marked as failed.
+    """
+
+    def __init__(self, name: str, fn: Callable, workers: int = 1, uses_fitz: bool = False,
+                 ordered: bool = False, always_run: bool = False, batch_size: int = None,
+                 batch_wait: float = 0.05):
+        self.name = name
+        self.fn = fn
+        self.workers = 1 if ordered else max(1, int(workers))
+        self.uses_fitz = uses_fitz
+        self.ordered = ordered
+        self.always_run = always_run
+        self.batch_size = max(1, int(batch_size)) if batch_size else None
+        self.batch_wait = batch_wait
+        self.queue = None
+
+        self._lock = threading.Lock()
+        self._alive = 0
+        self.processed = 0
+        self.batches = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.lock_wait = 0.0
+        self.max_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+
+    def _sample_depth(self):
+        if self.queue is None:
+            return
+        depth = self.queue.qsize()
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_total += depth
+            self._depth_samples += 1
+
+    def report(self, elapsed: float) -> dict:
+        """Throughput and queue depth of this stage over a run of `elapsed` seconds."""
+        busy_capacity = max(elapsed * self.workers, 1e-9)
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "calls": self.batches,
+            "failed": self.failed,
+            "busy_s": round(self.busy_time, 3),
+            "lock_wait_s": round(self.lock_wait, 3),
+            "utilization": round(min(1.0, self.busy_time / busy_capacity), 3),
+            "pages_per_s": round(self.processed / elapsed, 3) if elapsed > 0 else 0.0,
+            "avg_queue_depth": round(self._depth_total / self._depth_samples, 2) if self._depth_samples else 0.0,
+            "max_queue_depth": self.max_depth,
+        }
+
+
+class PagePipeline:
+    """
+    Producer/consumer pipeline connecting `stages` with bounded queues.
+    At most `max_in_flight` pages exist between the first and the last stage, which
+    bounds the number of rendered page images held in memory (backpressure).
+    `on_stage(stage_name, tasks, busy_s, lock_wait_s)` is called after every stage call.
+    """
+
+    def __init__(self, stages: List[Stage], max_in_flight: int = 4, lock=None, on_stage: Callable = None):
+        self.stages = stages
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.lock = lock or threading.RLock()
+        self.on_stage = on_stage
+        self.elapsed = 0.0
+        self._slots = threading.Semaphore(self.max_in_flight)
+
+    def run(self, tasks: Iterable[PageTask]):
+        """Pushes every task through all stages and returns once the last one has left the pipeline."""
+        for stage in self.stages:
+            stage.queue = queue.Queue(maxsize=self.max_in_flight)
+            stage._alive = stage.workers
+
+        threads = []
+        for pos, stage in enumerate(self.stages):
+            for w in range(stage.workers):
+                t = threading.Thread(target=self._worker, args=(pos,), name=f"pipeline-{stage.name}-{w}", daemon=True)
+                t.start()
+                threads.append(t)
+
+        start = time.time()
+        first = self.stages[0].queue
+        try:
+            for task in tasks:
+                self._slots.acquire()
+                first.put(task)
+        finally:
+            first.put(_DONE)
+            for t in threads:
+                t.join()
+            self.elapsed = time.time() - start
+
+    def run_inline(self, tasks: Iterable[PageTask]):
+        """
+        Runs every stage on the calling thread (no concurrency). Pages go one after another,
+        or in groups as large as the biggest `batch_size` so batched stages still get batches.
+        A group never exceeds `max_in_flight` pages, which keeps the same memory bound as run().
+        """
+        start = time.time()
+        group_size = min(self.max_in_flight, max(stage.batch_size or 1 for stage in self.stages))
+        group = []
+        for task in tasks:
+            group.append(task)
+            if len(group) >= group_size:
+                self._run_group(group)
+                group = []
+        if group:
+            self._run_group(group)
+        self.elapsed = time.time() - start
+
+    def _run_group(self, group: List[PageTask]):
+        for stage in self.stages:
+            if stage.batch_size:
+                for i in range(0, len(group), stage.batch_size):
+                    self._run_stage(stage, group[i:i + stage.batch_size])
+            else:
+                for task in group:
+                    self._run_stage(stage, [task])
+
+    def report(self) -> dict:
+        return {stage.name: stage.report(self.elapsed) for stage in self.stages}
+
+    def bottleneck(self) -> str:
+        """Name of the stage with the highest utilization."""
+        reports = self.report()
+        return max(reports, key=lambda name: reports[name]["utilization"]) if reports else ""
+
+    def _run_stage(self, stage: Stage, items: List[PageTask]):
+        items = [task for task in items if (task.error is None and not task.done) or stage.always_run]
+        if not items:
+            return
+        failed = 0
+        wait_start = time.time()
+        if stage.uses_fitz:
+            self.lock.acquire()
+        t0 = time.time()
+        try:
+            if stage.batch_size:
+                stage.fn(items)
+            else:
+                stage.fn(items[0])
+        except Exception as e:
+            for task in items:
+                if task.error is None:
+                    failed += 1
+                    task.error = e
+                    task.error_stage = stage.name
+        finally:
+            t1 = time.time()
+            if stage.uses_fitz:
+                self.lock.release()
+        with stage._lock:
+            stage.processed += len(items)
+            stage.batches += 1
+            stage.failed += failed
+            stage.busy_time += t1 - t0
+            stage.lock_wait += t0 - wait_start
+        if self.on_stage:
+            self.on_stage(stage.name, items, t1 - t0, t0 - wait_start)
+
+    def _worker(self, pos: int):
+        stage = self.stages[pos]
+        q_in = stage.queue
+        q_out = self.stages[pos + 1].queue if pos + 1 < len(self.stages) else None
+        is_last = q_out is None
+        pending = {}
+        next_seq = 0
+
+        while True:
+            task = q_in.get()
+            if task is _DONE:
+                q_in.put(_DONE)  # wake up sibling workers
+                with stage._lock:
+                    stage._alive -= 1
+                    last_worker = stage._alive == 0
+                if last_worker and q_out is not None:
+                    q_out.put(_DONE)
+                return
+            stage._sample_depth()
+
+            if stage.ordered:
+                pending[task.seq] = task
+                ready = []
+                while next_seq in pending:
+                    ready.append(pending.pop(next_seq))
+                    next_seq += 1
+                calls = [[item] for item in ready]
+            elif stage.batch_size:
+                calls = [self._collect_batch(stage, task)]
+            else:
+                calls = [[task]]
+
+            for items in calls:
+                self._run_stage(stage, items)
+                for item in items:
+                    if is_last:
+                        self._slots.release()
+                    else:
+                        q_out.put(item)
+
+    def _collect_batch(self, stage: Stage, first: PageTask) -> List[PageTask]:
+        """Adds queued tasks to `first` until the batch is full or nothing arrives for `batch_wait` seconds."""
+        batch = [first]
+        deadline = time.time() + stage.batch_wait
+        while len(batch) < stage.batch_size:
+            try:
+                task = stage.queue.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                break
+            if task is _DONE:
+                stage.queue.put(_DONE)  # handled by the worker loop after this batch
+                break
+            batch.append(task)
+        return batch
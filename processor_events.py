@@ -0,0 +1,127 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+# Event kinds emitted by ClinicalDocumentProcessor (fields in brackets)
+DOCUMENT_START = "document_start"   # [pages]
+PAGE_DONE = "page_done"             # [page (1-based), restored, error]
+PAGE_STAGE = "page_stage"           # one pipeline stage call [stage, pages, seconds, lock_wait_s]
+STAGE_START = "stage_start"         # document-level span opens [stage, bytes (optional)]
+STAGE_END = "stage_end"             # and closes [stage, seconds, error]
+API_CALL = "api_call"               # [api, method, request_bytes, response_bytes, seconds]
+REPORT = "report"                   # end-of-document statistics, one field per report (upload_stats, api_stats, ...)
+EVENT_KINDS = (DOCUMENT_START, PAGE_DONE, PAGE_STAGE, STAGE_START, STAGE_END, API_CALL, REPORT)
+
+
+class ProcessorEvent:
+    """One event: its kind, when it happened (time.time()) and its fields."""
+    __slots__ = ("kind", "time", "fields")
+
+    def __init__(self, kind: str, fields: dict):
+        self.kind = kind
+        self.time = time.time()
+        self.fields = fields
+
+    def to_dict(self, **context) -> dict:
+        return {"time": round(self.time, 3), **context, "event": self.kind, **self.fields}
+
+    def __repr__(self):
+        return f"ProcessorEvent({self.kind}, {self.fields})"
+
+
+class EventBus:
+    """
+    Typed progress and telemetry events of a processor. Subscribers are called synchronously on
+    the thread that emits (pipeline workers included), so they must be quick and thread-safe.
+    Nothing is built when no one listens: check `wants(kind)` before computing costly fields.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Replaced, never mutated, so emit() can read it without the lock
+        self._subscribers = ()
+        self._kinds = frozenset()
+
+    def subscribe(self, callback: Callable, kinds: Iterable[str] = None) -> Callable:
+        """Calls `callback(event)` for every event, or only those of `kinds`. Returns `callback` (for unsubscribe)."""
+        kinds = frozenset(kinds) if kinds is not None else None
+        with self._lock:
+            self._subscribers = self._subscribers + ((callback, kinds),)
+            self._update_kinds()
+        return callback
+
+    def unsubscribe(self, callback: Callable):
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s[0] is not callback)
+            self._update_kinds()
+
+    def _update_kinds(self):
+        kinds = set()
+        for _, sub_kinds in self._subscribers:
+            kinds |= set(EVENT_KINDS) if sub_kinds is None else sub_kinds
+        self._kinds = frozenset(kinds)
+
+    def wants(self, kind: str) -> bool:
+        return kind in self._kinds
+
+    def emit(self, kind: str, **fields):
+        if kind not in self._kinds:
+            return
+        event = ProcessorEvent(kind, fields)
+        for callback, kinds in self._subscribers:
+            if kinds is None or kind in kinds:
+                callback(event)
+
+    def start(self, stage: str, **fields) -> float:
+        """Opens a document-level span: emits STAGE_START and returns the start time for end()."""
+        self.emit(STAGE_START, stage=stage, **fields)
+        return time.time()
+
+    def end(self, stage: str, t0: float, error: str = None):
+        self.emit(STAGE_END, stage=stage, seconds=round(time.time() - t0, 4), error=error)
+
+    @contextmanager
+    def span(self, stage: str, **fields):
+        """start() and end() around a block (the span is closed with the error if the block raises)."""
+        t0 = self.start(stage, **fields)
+        try:
+            yield
+        except Exception as e:
+            self.end(stage, t0, error=str(e))
+            raise
+        self.end(stage, t0)
+
+
+def message_size(message) -> int:
+    """Serialized size of a proto-plus response, in bytes (0 if it is not a protobuf message)."""
+    try:
+        return type(message).pb(message).ByteSize()
+    except Exception:
+        return 0
+
+
+class JsonlExporter:
+    """Appends events (or plain dicts) to `path`, one JSON object per line. Safe to share between threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record: dict):
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def export(self, event: ProcessorEvent, **context):
+        """Writes `event` with extra `context` fields (e.g. doc=filename)."""
+        self.write(event.to_dict(**context))
+
+    __call__ = export
+
+    def close(self):
+        with self._lock:
+            self._file.close()